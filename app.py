@@ -1,10 +1,17 @@
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import ctypes
 from ctypes import wintypes
 from datetime import datetime
 from difflib import SequenceMatcher
+import functools
 from html.parser import HTMLParser
+import importlib.metadata
 import io
 import json
+import os
 from pathlib import Path
 import re
 import threading
@@ -29,8 +36,19 @@ except Exception:
     Figure = None
 
 try:
-    from wordfreq import zipf_frequency
+    from lxml import html as lxml_html
 except Exception:
+    lxml_html = None
+
+try:
+    import orjson
+except Exception:
+    orjson = None
+
+try:
+    from wordfreq import top_n_list, zipf_frequency
+except Exception:
+    top_n_list = None
     zipf_frequency = None
 
 
@@ -42,6 +60,7 @@ SESSION_PREV_FILE = DATA_DIR / "session.prev.json"
 BACKUP_DIR = DATA_DIR / "backups"
 SETTINGS_FILE = DATA_DIR / "settings.json"
 CUSTOM_DICTIONARY_FILE = DATA_DIR / "custom_dictionary.json"
+SPELL_VERDICT_CACHE_FILE = DATA_DIR / "spell_cache.json"
 AUTOSAVE_MS = 2000
 AUTOSAVE_BACKUP_MS = 30000
 MAX_SESSION_BACKUPS = 120
@@ -59,7 +78,87 @@ BULLET_INDENT_SPACES = 4
 BULLET_LINE_PATTERN = re.compile(
     r"^([ \t]*)([-*+\u2022\u25E6\u25AA\u25AB])\s"
 )
+BULLET_PREFIX_CHARS = frozenset("-*+\u2022\u25E6\u25AA\u25AB")
+LEADING_WS_PATTERN = re.compile(r"^[ \t]*")
+LAST_WORD_PATTERN = re.compile(r"\S+\s*$")
+NAV_MOD_KEYSYMS = frozenset((
+    "BackSpace",
+    "Delete",
+    "Left",
+    "Right",
+    "Up",
+    "Down",
+    "Home",
+    "End",
+    "Page_Up",
+    "Page_Down",
+    "Insert",
+    "Escape",
+    "Tab",
+    "Return",
+    "KP_Enter",
+    "Shift_L",
+    "Shift_R",
+    "Control_L",
+    "Control_R",
+    "Alt_L",
+    "Alt_R",
+    "Meta_L",
+    "Meta_R",
+    "Super_L",
+    "Super_R",
+    "Caps_Lock",
+    "Num_Lock",
+    "Scroll_Lock",
+))
+NUMBERED_HEADING_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)*)[.)]?\s+\S")
+LETTER_RUN_PATTERN = re.compile(r"[A-Za-z\u00C0-\u024F]+")
+LETTER_RUN_ASCII_PATTERN = re.compile(r"[A-Za-z]+")
+HYPHEN_SPLIT_PATTERN = re.compile(r"[-\u2010-\u2015]")
+TRAILING_NULLS_PATTERN = re.compile(rb"\x00+$")
 TOC_HEADING_PATTERN = re.compile(r"^\s*\d+(?:\.\d+)*(?:[.)])?\s+\S")
+HTML_FRAGMENT_MARKER_PATTERN = re.compile(
+    r"<!--\s*StartFragment\s*-->(.*?)<!--\s*EndFragment\s*-->",
+    re.IGNORECASE | re.DOTALL,
+)
+HTML_FRAGMENT_OFFSET_PATTERN = re.compile(
+    r"StartFragment:(\d+).*?EndFragment:(\d+)", re.IGNORECASE | re.DOTALL
+)
+HTML_BODY_PATTERN = re.compile(r"<body[^>]*>(.*?)</body>", re.IGNORECASE | re.DOTALL)
+STYLE_BLOCK_PATTERN = re.compile(
+    r"<style[^>]*>(.*?)</style>", re.IGNORECASE | re.DOTALL
+)
+CSS_RULE_PATTERN = re.compile(r"([^{}]+)\{([^{}]+)\}", re.DOTALL)
+CSS_VAR_DECL_PATTERN = re.compile(
+    r"(--[A-Za-z0-9_-]+)\s*:\s*([^;]+)", re.IGNORECASE
+)
+CSS_CLASS_NAME_PATTERN = re.compile(r"\.([A-Za-z0-9_-]+)")
+DASH_LINE_PATTERN = re.compile(r"\n[ \t]*-\s*\n")
+MANY_NEWLINES_PATTERN = re.compile(r"\n{3,}")
+CANONICAL_DASH_PATTERN = re.compile(r"\n[ \t]*-\s*")
+WHITESPACE_RUN_PATTERN = re.compile(r"\s+")
+CSS_IMPORTANT_PATTERN = re.compile(r"\s*!important\s*$", re.IGNORECASE)
+CSS_VAR_PATTERN = re.compile(r"var\(\s*(--[A-Za-z0-9_-]+)\s*(?:,\s*([^)]+))?\)")
+STYLE_FONT_PATTERN = re.compile(r"font\s*:\s*([^;]+)")
+STYLE_FONT_WEIGHT_PATTERN = re.compile(r"font-weight\s*:\s*([^;]+)")
+STYLE_FONT_VARIATION_PATTERN = re.compile(r"font-variation-settings\s*:\s*([^;]+)")
+STYLE_FONT_FAMILY_PATTERN = re.compile(r"font-family\s*:\s*([^;]+)")
+STYLE_BOLD_WORD_PATTERN = re.compile(r"\b(bold|bolder|semibold|demibold|black)\b")
+STYLE_BOLD_WEIGHT_PATTERN = re.compile(r"\b([5-9]00)\b")
+STYLE_WEIGHT_NUMBER_PATTERN = re.compile(r"([0-9]{3,4})")
+STYLE_WGHT_AXIS_PATTERN = re.compile(r"['\"]?wght['\"]?\s*([0-9]{2,4})")
+STYLE_IMPLIES_BOLD_CACHE_SIZE = 4096
+CLIPBOARD_PARSE_CACHE_SIZE = 32
+CAPTURE_SIMILARITY_THRESHOLD = 0.28
+CAPTURE_TRANSLATE_TABLE = str.maketrans({"\r": "\n", "\u00A0": " ", "\u202F": " "})
+RTF_TOKEN_PATTERN = re.compile(
+    r"\\([a-zA-Z]+)(-?\d+)? ?"
+    r"|\\'([0-9a-fA-F]{2})"
+    r"|\\(.)"
+    r"|([{}])"
+    r"|([^\\{}]+)",
+    re.DOTALL,
+)
 BOLD_TAG = "format_bold"
 SUPERSCRIPT_TAG = "format_superscript"
 IMAGE_TOKEN_HIDDEN_TAG = "image_token_hidden"
@@ -68,8 +167,13 @@ IDENTICAL_MATCH_TAG = "identical_match_highlight"
 SEARCH_MATCH_TAG = "search_match_highlight"
 SEARCH_CURRENT_TAG = "search_current_match"
 SPELLCHECK_DEBOUNCE_MS = 350
+SEARCH_DEBOUNCE_MS = 200
+TAG_ADD_CHUNK_RANGES = 1000
+SEARCH_VIEWPORT_TAG_THRESHOLD = 2000
+SPELLCHECK_CACHE_MAX_WORDS = 50000
 SPELLCHECK_MIN_ZIPF = 2.6
 SPELLCHECK_LANGS = ("en", "nb")
+SPELLCHECK_COMPOUND_ROOT_COUNT = 20000
 SPELLCHECK_CUSTOM_WORDS = {
     "ctrl",
     "alt",
@@ -83,6 +187,7 @@ SPELLCHECK_CUSTOM_WORDS = {
 }
 INLINE_IMAGE_MAX_WIDTH = 520
 INLINE_IMAGE_MAX_HEIGHT = 260
+INLINE_IMAGE_CACHE_SIZE = 64
 FORMULA_RENDER_DPI = 240
 FORMULA_RENDER_FONT_SIZE = 20
 BASE_ALPHA = 0.84
@@ -122,6 +227,44 @@ CLIPBOARD_STANDARD_FORMATS = {
     17: "CF_DIBV5",
 }
 
+# Shared Win32 handles. Loading the DLLs and declaring argtypes once at import
+# avoids re-walking the export tables per instance and per message-loop call.
+USER32 = ctypes.WinDLL("user32", use_last_error=True)
+KERNEL32 = ctypes.WinDLL("kernel32", use_last_error=True)
+
+USER32.RegisterClipboardFormatW.argtypes = [wintypes.LPCWSTR]
+USER32.RegisterClipboardFormatW.restype = wintypes.UINT
+USER32.OpenClipboard.argtypes = [wintypes.HWND]
+USER32.OpenClipboard.restype = wintypes.BOOL
+USER32.CloseClipboard.argtypes = []
+USER32.CloseClipboard.restype = wintypes.BOOL
+USER32.IsClipboardFormatAvailable.argtypes = [wintypes.UINT]
+USER32.IsClipboardFormatAvailable.restype = wintypes.BOOL
+USER32.GetClipboardData.argtypes = [wintypes.UINT]
+USER32.GetClipboardData.restype = wintypes.HANDLE
+USER32.EnumClipboardFormats.argtypes = [wintypes.UINT]
+USER32.EnumClipboardFormats.restype = wintypes.UINT
+USER32.GetClipboardFormatNameW.argtypes = [
+    wintypes.UINT,
+    wintypes.LPWSTR,
+    ctypes.c_int,
+]
+USER32.GetClipboardFormatNameW.restype = ctypes.c_int
+USER32.GetMessageW.argtypes = [
+    ctypes.POINTER(wintypes.MSG),
+    wintypes.HWND,
+    wintypes.UINT,
+    wintypes.UINT,
+]
+USER32.GetMessageW.restype = ctypes.c_int
+
+KERNEL32.GlobalSize.argtypes = [ctypes.c_void_p]
+KERNEL32.GlobalSize.restype = ctypes.c_size_t
+KERNEL32.GlobalLock.argtypes = [ctypes.c_void_p]
+KERNEL32.GlobalLock.restype = ctypes.c_void_p
+KERNEL32.GlobalUnlock.argtypes = [ctypes.c_void_p]
+KERNEL32.GlobalUnlock.restype = wintypes.BOOL
+
 
 class ClipboardHtmlRunParser(HTMLParser):
     BLOCK_TAGS = {
@@ -148,13 +291,20 @@ class ClipboardHtmlRunParser(HTMLParser):
 
     def __init__(self, class_bold_map=None, css_vars=None):
         super().__init__(convert_charrefs=True)
-        self.runs = []
+        # Each entry is [text_parts, is_bold]; parts are joined lazily so
+        # merging many small data events stays O(n) instead of re-concatenating
+        # the run string per event.
+        self._runs = []
         self._bold_depth = 0
         self._skip_depth = 0
-        self._tag_stack = []
+        # Parallel stacks (tag name + 0/1 bold flag) avoid allocating a tuple
+        # per element on deeply nested pastes.
+        self._tag_stack_names = []
+        self._tag_stack_bold = bytearray()
         self._li_depth = 0
         self._class_bold_map = class_bold_map or {}
         self._css_vars = css_vars or {}
+        self._bold_check = _compile_bold_check(tuple(sorted(self._css_vars.items())))
 
     @staticmethod
     def _resolve_css_value(value, css_vars, depth=0):
@@ -167,8 +317,10 @@ class ClipboardHtmlRunParser(HTMLParser):
         if not text:
             return ""
 
-        text = re.sub(r"\s*!important\s*$", "", text, flags=re.IGNORECASE).strip()
-        var_match = re.match(r"var\(\s*(--[A-Za-z0-9_-]+)\s*(?:,\s*([^)]+))?\)", text)
+        text = CSS_IMPORTANT_PATTERN.sub("", text).strip()
+        if "var(" not in text:
+            return text
+        var_match = CSS_VAR_PATTERN.match(text)
         if var_match:
             var_name = var_match.group(1).casefold()
             fallback = var_match.group(2).strip() if var_match.group(2) else ""
@@ -186,27 +338,42 @@ class ClipboardHtmlRunParser(HTMLParser):
         if not style_text:
             return False
 
+        # Style/class strings repeat heavily across a pasted document, so the
+        # cached helper sees mostly hits after the first few tags.
+        css_var_items = tuple(sorted(css_vars.items())) if css_vars else ()
+        return ClipboardHtmlRunParser._style_implies_bold_cached(
+            style_text, css_var_items
+        )
+
+    @staticmethod
+    @functools.lru_cache(maxsize=STYLE_IMPLIES_BOLD_CACHE_SIZE)
+    def _style_implies_bold_cached(style_text, css_var_items):
         lowered = style_text.casefold()
+        # Every bold-implying declaration mentions a font-* property, so most
+        # style strings can be rejected without running any of the patterns.
+        if "font" not in lowered and "bold" not in lowered:
+            return False
+        css_vars = dict(css_var_items)
 
-        font_match = re.search(r"font\s*:\s*([^;]+)", lowered)
+        font_match = STYLE_FONT_PATTERN.search(lowered)
         if font_match:
             font_value = ClipboardHtmlRunParser._resolve_css_value(
-                font_match.group(1), css_vars or {}
+                font_match.group(1), css_vars
             )
-            if re.search(r"\b(bold|bolder|semibold|demibold|black)\b", font_value):
+            if STYLE_BOLD_WORD_PATTERN.search(font_value):
                 return True
-            if re.search(r"\b([5-9]00)\b", font_value):
+            if STYLE_BOLD_WEIGHT_PATTERN.search(font_value):
                 return True
 
-        match = re.search(r"font-weight\s*:\s*([^;]+)", lowered)
+        match = STYLE_FONT_WEIGHT_PATTERN.search(lowered)
         if match:
             value = ClipboardHtmlRunParser._resolve_css_value(
-                match.group(1), css_vars or {}
+                match.group(1), css_vars
             ).strip()
             if value in {"bold", "bolder", "semibold", "demibold", "medium", "black"}:
                 return True
 
-            number_match = re.match(r"([0-9]{3,4})", value)
+            number_match = STYLE_WEIGHT_NUMBER_PATTERN.match(value)
             if number_match:
                 try:
                     if int(number_match.group(1)) >= 500:
@@ -214,12 +381,12 @@ class ClipboardHtmlRunParser(HTMLParser):
                 except Exception:
                     pass
 
-        variation_match = re.search(r"font-variation-settings\s*:\s*([^;]+)", lowered)
+        variation_match = STYLE_FONT_VARIATION_PATTERN.search(lowered)
         if variation_match:
             variation_value = ClipboardHtmlRunParser._resolve_css_value(
-                variation_match.group(1), css_vars or {}
+                variation_match.group(1), css_vars
             )
-            wght_match = re.search(r"['\"]?wght['\"]?\s*([0-9]{2,4})", variation_value)
+            wght_match = STYLE_WGHT_AXIS_PATTERN.search(variation_value)
             if wght_match:
                 try:
                     if int(wght_match.group(1)) >= 500:
@@ -227,10 +394,10 @@ class ClipboardHtmlRunParser(HTMLParser):
                 except Exception:
                     pass
 
-        family_match = re.search(r"font-family\s*:\s*([^;]+)", lowered)
+        family_match = STYLE_FONT_FAMILY_PATTERN.search(lowered)
         if family_match:
             family_value = ClipboardHtmlRunParser._resolve_css_value(
-                family_match.group(1), css_vars or {}
+                family_match.group(1), css_vars
             )
             if (
                 "bold" in family_value
@@ -244,39 +411,45 @@ class ClipboardHtmlRunParser(HTMLParser):
 
     def _attrs_imply_bold(self, attrs):
         attr_map = {k.lower(): (v or "") for k, v in attrs}
-        if self._style_implies_bold(attr_map.get("style", ""), self._css_vars):
+        if self._bold_check(attr_map.get("style", "")):
             return True
 
-        face_value = attr_map.get("face", "").casefold()
-        if face_value and (
-            "bold" in face_value
-            or "black" in face_value
-            or "semibold" in face_value
-            or "demibold" in face_value
-        ):
-            return True
+        face_value = attr_map.get("face")
+        if face_value:
+            face_value = face_value.casefold()
+            if (
+                "bold" in face_value
+                or "black" in face_value
+                or "semibold" in face_value
+                or "demibold" in face_value
+            ):
+                return True
 
         class_value = attr_map.get("class", "")
-        if class_value:
-            for class_name in re.split(r"\s+", class_value.strip()):
-                if class_name and self._class_bold_map.get(class_name):
+        if class_value and self._class_bold_map:
+            class_bold = self._class_bold_map.get
+            for class_name in class_value.split():
+                if class_bold(class_name):
                     return True
 
         return False
 
+    @property
+    def runs(self):
+        return [("".join(parts), is_bold) for parts, is_bold in self._runs]
+
     def _append(self, text, is_bold):
         if not text:
             return
-        if self.runs and self.runs[-1][1] == is_bold:
-            prev_text, _ = self.runs[-1]
-            self.runs[-1] = (prev_text + text, is_bold)
+        if self._runs and self._runs[-1][1] == is_bold:
+            self._runs[-1][0].append(text)
             return
-        self.runs.append((text, is_bold))
+        self._runs.append([[text], is_bold])
 
     def _append_newline(self):
-        if not self.runs:
+        if not self._runs:
             return
-        if self.runs[-1][0].endswith("\n"):
+        if self._runs[-1][0][-1].endswith("\n"):
             return
         self._append("\n", False)
 
@@ -307,7 +480,8 @@ class ClipboardHtmlRunParser(HTMLParser):
         if pushes_bold:
             self._bold_depth += 1
 
-        self._tag_stack.append((lowered, pushes_bold))
+        self._tag_stack_names.append(lowered)
+        self._tag_stack_bold.append(1 if pushes_bold else 0)
 
     def handle_endtag(self, tag):
         lowered = tag.lower()
@@ -319,11 +493,13 @@ class ClipboardHtmlRunParser(HTMLParser):
         if self._skip_depth > 0:
             return
 
-        for i in range(len(self._tag_stack) - 1, -1, -1):
-            stack_tag, pushes_bold = self._tag_stack[i]
-            if stack_tag != lowered:
+        names = self._tag_stack_names
+        for i in range(len(names) - 1, -1, -1):
+            if names[i] != lowered:
                 continue
-            self._tag_stack.pop(i)
+            del names[i]
+            pushes_bold = self._tag_stack_bold[i]
+            del self._tag_stack_bold[i]
             if pushes_bold and self._bold_depth > 0:
                 self._bold_depth -= 1
             break
@@ -342,118 +518,151 @@ class ClipboardHtmlRunParser(HTMLParser):
         self._append(data, self._bold_depth > 0)
 
 
+def _feed_lxml_node(collector, node):
+    tag = node.tag
+    if not isinstance(tag, str):
+        # Comments and processing instructions carry no runs, but their tail
+        # text still belongs to the parent element.
+        if node.tail:
+            collector.handle_data(node.tail)
+        return
+
+    tag = tag.lower()
+    collector.handle_starttag(tag, list(node.attrib.items()))
+    if node.text:
+        collector.handle_data(node.text)
+    for child in node:
+        _feed_lxml_node(collector, child)
+    collector.handle_endtag(tag)
+    if node.tail:
+        collector.handle_data(node.tail)
+
+
+def parse_html_runs(fragment, class_bold_map=None, css_vars=None):
+    """Parse clipboard HTML into (text, is_bold) runs.
+
+    Lexing happens in lxml's C parser when the package is available; the
+    run-collection rules stay in ClipboardHtmlRunParser either way, so both
+    paths produce identical runs.
+    """
+    if lxml_html is not None:
+        root = None
+        try:
+            root = lxml_html.fragment_fromstring(fragment, create_parent="div")
+        except Exception:
+            root = None
+        if root is not None:
+            collector = ClipboardHtmlRunParser(class_bold_map, css_vars)
+            # Wrapper-elementet er syntetisk og skal ikke utløse blokk-regelen
+            # for linjeskift; mat bare innholdet gjennom samleren.
+            if root.text:
+                collector.handle_data(root.text)
+            for child in root:
+                _feed_lxml_node(collector, child)
+            return collector.runs
+
+    parser = ClipboardHtmlRunParser(class_bold_map, css_vars)
+    parser.feed(fragment)
+    parser.close()
+    return parser.runs
+
+
+@functools.lru_cache(maxsize=CLIPBOARD_PARSE_CACHE_SIZE)
+def _parse_html_runs_cached(fragment, class_bold_items, css_var_items):
+    return tuple(
+        parse_html_runs(fragment, dict(class_bold_items), dict(css_var_items))
+    )
+
+
+@functools.lru_cache(maxsize=CLIPBOARD_PARSE_CACHE_SIZE)
+def _parse_rtf_runs_cached(rtf_text):
+    return tuple(ClipboardRtfRunParser().parse(rtf_text))
+
+
+@functools.lru_cache(maxsize=CLIPBOARD_PARSE_CACHE_SIZE)
+def _compile_bold_check(css_var_items):
+    """Partially evaluate the style bold-check for a fixed css-vars snapshot.
+
+    The vars never change within one paste, so each parser gets a closure
+    with the sorted items baked in instead of rebuilding them per attribute.
+    """
+    cached_check = ClipboardHtmlRunParser._style_implies_bold_cached
+
+    def check(style_text):
+        return bool(style_text) and cached_check(style_text, css_var_items)
+
+    return check
+
+
 class ClipboardRtfRunParser:
     def __init__(self):
-        self.runs = []
+        self._runs = []
         self._bold = False
-        self._bold_stack = []
+        self._bold_stack = bytearray()
         self._uc_skip = 1
         self._pending_skip = 0
 
+    @property
+    def runs(self):
+        return [("".join(parts), is_bold) for parts, is_bold in self._runs]
+
     def _append(self, text, is_bold=None):
         if not text:
             return
         if is_bold is None:
             is_bold = self._bold
-        if self.runs and self.runs[-1][1] == is_bold:
-            prev_text, _ = self.runs[-1]
-            self.runs[-1] = (prev_text + text, is_bold)
+        if self._runs and self._runs[-1][1] == is_bold:
+            self._runs[-1][0].append(text)
             return
-        self.runs.append((text, is_bold))
-
-    def _read_control_word(self, text, index):
-        n = len(text)
-        start = index
-        while index < n and text[index].isalpha():
-            index += 1
-        word = text[start:index]
-
-        sign = 1
-        if index < n and text[index] in ("-", "+"):
-            sign = -1 if text[index] == "-" else 1
-            index += 1
-
-        number_start = index
-        while index < n and text[index].isdigit():
-            index += 1
-        number = None
-        if number_start < index:
-            number = sign * int(text[number_start:index])
-
-        if index < n and text[index] == " ":
-            index += 1
-
-        return word, number, index
+        self._runs.append([[text], is_bold])
 
     def parse(self, rtf_text):
-        self.runs = []
+        self._runs = []
         self._bold = False
-        self._bold_stack = []
+        self._bold_stack = bytearray()
         self._uc_skip = 1
         self._pending_skip = 0
 
-        i = 0
-        n = len(rtf_text)
-        while i < n:
-            ch = rtf_text[i]
-
-            if self._pending_skip > 0 and ch not in ("\\", "{", "}"):
-                self._pending_skip -= 1
-                i += 1
-                continue
-
-            if ch == "{":
-                self._bold_stack.append(self._bold)
-                i += 1
+        # One regex token per control word / escape / brace / literal run keeps
+        # the per-character work inside the regex engine instead of the
+        # interpreter loop.
+        for match in RTF_TOKEN_PATTERN.finditer(rtf_text):
+            word, number_text, hex_value, symbol, brace, literal = match.groups()
+
+            if brace is not None:
+                if brace == "{":
+                    self._bold_stack.append(1 if self._bold else 0)
+                elif self._bold_stack:
+                    self._bold = bool(self._bold_stack.pop())
                 continue
 
-            if ch == "}":
-                if self._bold_stack:
-                    self._bold = self._bold_stack.pop()
-                i += 1
+            if literal is not None:
+                if self._pending_skip > 0:
+                    skipped = min(self._pending_skip, len(literal))
+                    self._pending_skip -= skipped
+                    literal = literal[skipped:]
+                self._append(literal)
                 continue
 
-            if ch != "\\":
-                self._append(ch)
-                i += 1
-                continue
-
-            i += 1
-            if i >= n:
-                break
-
-            symbol = rtf_text[i]
-            if symbol in ("\\", "{", "}"):
-                self._append(symbol)
-                i += 1
-                continue
-
-            if symbol == "'":
-                if i + 2 < n:
-                    hex_value = rtf_text[i + 1 : i + 3]
-                    try:
-                        decoded = bytes.fromhex(hex_value).decode("cp1252")
-                        self._append(decoded)
-                    except Exception:
-                        pass
-                    i += 3
-                else:
-                    i += 1
+            if hex_value is not None:
+                try:
+                    self._append(bytes.fromhex(hex_value).decode("cp1252"))
+                except Exception:
+                    pass
                 continue
 
-            if not symbol.isalpha():
-                if symbol == "~":
+            if symbol is not None:
+                if symbol in ("\\", "{", "}"):
+                    self._append(symbol)
+                elif symbol == "~":
                     self._append(" ")
                 elif symbol == "_":
                     self._append("-")
                 elif symbol == "-":
                     self._append("-")
-                elif symbol == "*":
-                    pass
-                i += 1
                 continue
 
-            word, number, i = self._read_control_word(rtf_text, i)
+            number = int(number_text) if number_text else None
             if word == "b":
                 self._bold = False if number == 0 else True
             elif word in ("par", "line"):
@@ -498,14 +707,12 @@ class GlobalHotkeyListener:
     def stop(self):
         if self._thread_id is None:
             return
-        user32 = ctypes.windll.user32
-        user32.PostThreadMessageW(self._thread_id, self.WM_QUIT, 0, 0)
+        USER32.PostThreadMessageW(self._thread_id, self.WM_QUIT, 0, 0)
         self._thread.join(timeout=1.0)
 
     def _run(self):
-        user32 = ctypes.windll.user32
-        kernel32 = ctypes.windll.kernel32
-        self._thread_id = kernel32.GetCurrentThreadId()
+        user32 = USER32
+        self._thread_id = KERNEL32.GetCurrentThreadId()
 
         vk_data = user32.VkKeyScanW(ord(self.HOTKEY_CHAR))
         if vk_data == -1:
@@ -533,12 +740,19 @@ class GlobalHotkeyListener:
 
         self._registered = True
         msg = wintypes.MSG()
+        msg_ref = ctypes.byref(msg)
+        get_message = user32.GetMessageW
+        wm_hotkey = self.WM_HOTKEY
+        on_hotkey = self._on_hotkey
+        # The WM_HOTKEY..WM_HOTKEY range filter makes the kernel drop all
+        # other thread messages before they reach user mode; WM_QUIT is
+        # always delivered regardless of the filter, so stop() still works.
         while True:
-            result = user32.GetMessageW(ctypes.byref(msg), None, 0, 0)
+            result = get_message(msg_ref, None, wm_hotkey, wm_hotkey)
             if result in (0, -1):
                 break
-            if msg.message == self.WM_HOTKEY and msg.wParam == 1:
-                self._on_hotkey()
+            if msg.wParam == 1:
+                on_hotkey()
 
         if self._registered:
             user32.UnregisterHotKey(None, 1)
@@ -552,8 +766,9 @@ class NoteOverlayApp:
         BACKUP_DIR.mkdir(exist_ok=True)
         self.settings = self._load_settings()
         self._user_spell_words = self._load_user_dictionary_words()
-        self.custom_spell_words = set(SPELLCHECK_CUSTOM_WORDS)
-        self.custom_spell_words.update(self._user_spell_words)
+        self.custom_spell_words = frozenset(SPELLCHECK_CUSTOM_WORDS) | frozenset(
+            self._user_spell_words
+        )
         self.autosave_ms = int(self.settings.get("autosave_ms", AUTOSAVE_MS))
         self.pdf_line_spacing = float(
             self.settings.get("pdf_line_spacing", DEFAULT_PDF_LINE_SPACING)
@@ -589,32 +804,93 @@ class NoteOverlayApp:
         self.text_font = self._pick_font(("Segoe UI", "Calibri"), 11)
         self.text_bold_font = (self.text_font[0], self.text_font[1], "bold")
 
+        # Shared widget styling; one dict per widget family instead of the
+        # same kwargs block repeated at every call site.
+        self._soft_label_kw = {
+            "bg": self.theme["card_soft"],
+            "fg": self.theme["text"],
+            "font": self.ui_font,
+        }
+        self._card_label_kw = {
+            "bg": self.theme["card"],
+            "fg": self.theme["text"],
+            "font": self.ui_font,
+        }
+        self._entry_kw = {
+            "relief": "flat",
+            "borderwidth": 0,
+            "bg": self.theme["card"],
+            "fg": self.theme["text"],
+            "insertbackground": self.theme["text"],
+        }
+        self._spinbox_kw = {
+            "relief": "flat",
+            "borderwidth": 1,
+            "bg": self.theme["card_soft"],
+        }
+
         self.root.configure(bg=self.theme["bg"])
         self._fade_after_id = None
 
         self.attachments = {}
         self.formula_meta = {}
+        self._attachment_sizes = {}
+        self._inline_photo_cache = OrderedDict()
         self._dirty = False
+        self._dirty_seq = 0
+        self._export_paragraphs_cache = None
+        self._pdf_style_cache = None
+        self._session_loading = False
         self.auto_capture_enabled = False
         self._last_clipboard_signature = None
+        self._capture_cache = None
+        self._capture_parse_busy = False
+        # Parsing av HTML/RTF-payloads skjer utenfor Tk-løkka, som for
+        # stavekontrollen; råbytes leses fortsatt på hovedtråden.
+        self._capture_executor = ThreadPoolExecutor(max_workers=1)
         self._inline_image_refs = []
         self.bold_typing_mode = False
         self._spellcheck_after_id = None
         self.spellcheck_enabled = True
         self._spellcheck_available = zipf_frequency is not None
+        self._zipf_cache = {}
+        self._compound_roots = None
+        self._bullet_prefix_cache = {}
+        self._word_verdict_cache = self._load_spell_verdict_cache()
+        self._last_spellcheck_lines = None
+        self._spellcheck_generation = 0
+        self._spellcheck_pending_version = -1
+        # One reusable worker: scans queue up in order instead of spawning a
+        # thread per debounce tick.
+        self._spellcheck_executor = ThreadPoolExecutor(max_workers=1)
+        # Disk-tunge jobber (eksportbygging, sesjonslasting) går også
+        # utenfor Tk-løkka.
+        self._export_executor = ThreadPoolExecutor(max_workers=1)
         self._last_backup_snapshot_key = None
         self._last_backup_snapshot_at = None
+        self._last_session_serialized = None
         self._last_identical_token = ""
         self.focus_mode = False
         self.search_panel_visible = False
+        self._text_cache = None
+        self._text_cache_line_starts = None
+        self._text_cache_lower = None
+        self._text_cache_image_cols = None
+        self._text_version = 0
+        self._last_search_key = None
+        self._suppress_modified = False
         self._search_match_ranges = []
+        self._search_match_start_lines = []
+        self._search_viewport_mode = False
         self._search_current_idx = -1
+        self._search_debounce_id = None
         self.search_var = tk.StringVar()
         self.replace_var = tk.StringVar()
         self.search_case_var = tk.BooleanVar(value=False)
         self._toc_window = None
         self._toc_listbox = None
         self._toc_entries = []
+        self._toc_cache = None
         self._settings_window = None
         self._context_menu = None
 
@@ -656,34 +932,26 @@ class NoteOverlayApp:
             pass
 
     def _init_clipboard_api(self):
-        self._u32 = ctypes.WinDLL("user32", use_last_error=True)
-        self._k32 = ctypes.WinDLL("kernel32", use_last_error=True)
-
-        self._u32.RegisterClipboardFormatW.argtypes = [wintypes.LPCWSTR]
-        self._u32.RegisterClipboardFormatW.restype = wintypes.UINT
-        self._u32.OpenClipboard.argtypes = [wintypes.HWND]
-        self._u32.OpenClipboard.restype = wintypes.BOOL
-        self._u32.CloseClipboard.argtypes = []
-        self._u32.CloseClipboard.restype = wintypes.BOOL
-        self._u32.IsClipboardFormatAvailable.argtypes = [wintypes.UINT]
-        self._u32.IsClipboardFormatAvailable.restype = wintypes.BOOL
-        self._u32.GetClipboardData.argtypes = [wintypes.UINT]
-        self._u32.GetClipboardData.restype = wintypes.HANDLE
-        self._u32.EnumClipboardFormats.argtypes = [wintypes.UINT]
-        self._u32.EnumClipboardFormats.restype = wintypes.UINT
-        self._u32.GetClipboardFormatNameW.argtypes = [
-            wintypes.UINT,
-            wintypes.LPWSTR,
-            ctypes.c_int,
-        ]
-        self._u32.GetClipboardFormatNameW.restype = ctypes.c_int
+        self._u32 = USER32
+        self._k32 = KERNEL32
+        # Reused across every clipboard poll to avoid per-call buffer churn.
+        self._clip_name_buf = ctypes.create_unicode_buffer(256)
+        # Formatnavn er stabile per økt; slå dem opp i Win32 bare én gang.
+        self._clip_name_cache = {}
+        self._html_format_ids = self._register_clipboard_formats(
+            CLIPBOARD_HTML_FORMAT_NAMES
+        )
+        self._rtf_format_ids = self._register_clipboard_formats(
+            CLIPBOARD_RTF_FORMAT_NAMES
+        )
 
-        self._k32.GlobalSize.argtypes = [ctypes.c_void_p]
-        self._k32.GlobalSize.restype = ctypes.c_size_t
-        self._k32.GlobalLock.argtypes = [ctypes.c_void_p]
-        self._k32.GlobalLock.restype = ctypes.c_void_p
-        self._k32.GlobalUnlock.argtypes = [ctypes.c_void_p]
-        self._k32.GlobalUnlock.restype = wintypes.BOOL
+    def _register_clipboard_formats(self, format_names):
+        format_ids = []
+        for format_name in format_names:
+            format_id = self._u32.RegisterClipboardFormatW(format_name)
+            if format_id:
+                format_ids.append(format_id)
+        return format_ids
 
     def _pick_font(self, candidates, size):
         available = set(tkfont.families())
@@ -778,6 +1046,56 @@ class NoteOverlayApp:
             json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8"
         )
 
+    def _spell_cache_signature(self):
+        try:
+            wordfreq_version = importlib.metadata.version("wordfreq")
+        except Exception:
+            wordfreq_version = "ukjent"
+        return f"{wordfreq_version}:{','.join(SPELLCHECK_LANGS)}"
+
+    def _load_spell_verdict_cache(self):
+        if not self._spellcheck_available or not SPELL_VERDICT_CACHE_FILE.exists():
+            return {}
+        try:
+            payload = json.loads(SPELL_VERDICT_CACHE_FILE.read_text(encoding="utf-8"))
+        except Exception:
+            return {}
+        if not isinstance(payload, dict):
+            return {}
+        if payload.get("signature") != self._spell_cache_signature():
+            # En annen wordfreq-versjon kan gi andre frekvenser; start blankt.
+            return {}
+
+        verdicts = payload.get("verdicts")
+        if not isinstance(verdicts, dict):
+            return {}
+
+        cache = {}
+        for word, verdict in verdicts.items():
+            if not isinstance(word, str) or not isinstance(verdict, bool):
+                continue
+            # Ord lagt til i ordboken etter forrige økt skal ikke flagges.
+            if not verdict and word.casefold() in self.custom_spell_words:
+                continue
+            cache[word] = verdict
+            if len(cache) >= SPELLCHECK_CACHE_MAX_WORDS:
+                break
+        return cache
+
+    def _save_spell_verdict_cache(self):
+        if not self._spellcheck_available or not self._word_verdict_cache:
+            return
+        payload = {
+            "signature": self._spell_cache_signature(),
+            "verdicts": self._word_verdict_cache,
+        }
+        try:
+            SPELL_VERDICT_CACHE_FILE.write_text(
+                json.dumps(payload, ensure_ascii=False), encoding="utf-8"
+            )
+        except Exception:
+            pass
+
     def _create_button(self, parent, text, command, primary=False):
         bg = self.theme["accent"] if primary else self.theme["button"]
         fg = "#ffffff" if primary else self.theme["text"]
@@ -827,23 +1145,33 @@ class NoteOverlayApp:
         animate()
 
     def _build_ui(self):
-        self.container_frame = tk.Frame(self.root, bg=self.theme["bg"])
+        # Theme colors as locals: these run once per window but touch
+        # dozens of widget kwargs.
+        theme = self.theme
+        bg = theme["bg"]
+        card = theme["card"]
+        card_soft = theme["card_soft"]
+        text_color = theme["text"]
+        border = theme["border"]
+        muted = theme["muted"]
+        status = theme["status"]
+        self.container_frame = tk.Frame(self.root, bg=bg)
         self.container_frame.pack(fill="both", expand=True, padx=14, pady=14)
 
         self.header_frame = tk.Frame(
             self.container_frame,
-            bg=self.theme["card"],
+            bg=card,
             highlightthickness=1,
-            highlightbackground=self.theme["border"],
-            highlightcolor=self.theme["border"],
+            highlightbackground=border,
+            highlightcolor=border,
         )
         self.header_frame.pack(fill="x")
 
         tk.Label(
             self.header_frame,
             text="Quick Notes",
-            bg=self.theme["card"],
-            fg=self.theme["text"],
+            bg=card,
+            fg=text_color,
             font=self.title_font,
             padx=12,
             pady=8,
@@ -852,14 +1180,14 @@ class NoteOverlayApp:
         tk.Label(
             self.header_frame,
             text="|",
-            bg=self.theme["card_soft"],
-            fg=self.theme["muted"],
+            bg=card_soft,
+            fg=muted,
             font=self.ui_font,
             padx=10,
             pady=5,
         ).pack(side="right", padx=10, pady=8)
 
-        self.toolbar_frame = tk.Frame(self.container_frame, bg=self.theme["bg"])
+        self.toolbar_frame = tk.Frame(self.container_frame, bg=bg)
         self.toolbar_frame.pack(fill="x", pady=(10, 8))
 
         btn_new = self._create_button(self.toolbar_frame, "Nytt", self.new_note)
@@ -921,29 +1249,20 @@ class NoteOverlayApp:
 
         self.search_panel = tk.Frame(
             self.container_frame,
-            bg=self.theme["card_soft"],
+            bg=card_soft,
             highlightthickness=1,
-            highlightbackground=self.theme["border"],
-            highlightcolor=self.theme["border"],
+            highlightbackground=border,
+            highlightcolor=border,
         )
 
         tk.Label(
-            self.search_panel,
-            text="Finn",
-            bg=self.theme["card_soft"],
-            fg=self.theme["text"],
-            font=self.ui_font,
-            padx=8,
+            self.search_panel, text="Finn", padx=8, **self._soft_label_kw
         ).pack(side="left")
         self.entry_search = tk.Entry(
             self.search_panel,
             textvariable=self.search_var,
-            relief="flat",
-            borderwidth=0,
-            bg=self.theme["card"],
-            fg=self.theme["text"],
-            insertbackground=self.theme["text"],
             width=24,
+            **self._entry_kw,
         )
         self.entry_search.pack(side="left", padx=(0, 6), pady=6, ipady=4)
         self.entry_search.bind("<KeyRelease>", self._on_search_query_changed)
@@ -955,11 +1274,11 @@ class NoteOverlayApp:
             text="Aa",
             variable=self.search_case_var,
             command=self._refresh_search_matches,
-            bg=self.theme["card_soft"],
-            fg=self.theme["text"],
-            selectcolor=self.theme["card_soft"],
-            activebackground=self.theme["card_soft"],
-            activeforeground=self.theme["text"],
+            bg=card_soft,
+            fg=text_color,
+            selectcolor=card_soft,
+            activebackground=card_soft,
+            activeforeground=text_color,
             font=self.ui_font,
             padx=4,
         )
@@ -972,23 +1291,14 @@ class NoteOverlayApp:
         btn_next.pack(side="left", padx=(0, 8))
 
         tk.Label(
-            self.search_panel,
-            text="Erstatt",
-            bg=self.theme["card_soft"],
-            fg=self.theme["text"],
-            font=self.ui_font,
-            padx=4,
+            self.search_panel, text="Erstatt", padx=4, **self._soft_label_kw
         ).pack(side="left")
 
         self.entry_replace = tk.Entry(
             self.search_panel,
             textvariable=self.replace_var,
-            relief="flat",
-            borderwidth=0,
-            bg=self.theme["card"],
-            fg=self.theme["text"],
-            insertbackground=self.theme["text"],
             width=18,
+            **self._entry_kw,
         )
         self.entry_replace.pack(side="left", padx=(2, 6), pady=6, ipady=4)
         self.entry_replace.bind("<Return>", self._on_replace_one_shortcut)
@@ -1010,10 +1320,10 @@ class NoteOverlayApp:
 
         self.text_frame = tk.Frame(
             self.container_frame,
-            bg=self.theme["card"],
+            bg=card,
             highlightthickness=1,
-            highlightbackground=self.theme["border"],
-            highlightcolor=self.theme["border"],
+            highlightbackground=border,
+            highlightcolor=border,
         )
         self.text_frame.pack(fill="both", expand=True)
         self.text_frame.grid_rowconfigure(0, weight=1)
@@ -1028,9 +1338,9 @@ class NoteOverlayApp:
             borderwidth=0,
             padx=12,
             pady=12,
-            bg=self.theme["card"],
-            fg=self.theme["text"],
-            insertbackground=self.theme["text"],
+            bg=card,
+            fg=text_color,
+            insertbackground=text_color,
             selectbackground="#d8e6ff",
             highlightthickness=0,
             spacing1=2,
@@ -1045,25 +1355,32 @@ class NoteOverlayApp:
         self.text.tag_configure(IDENTICAL_MATCH_TAG, background="#fff1a8")
         self.text.tag_configure(SEARCH_MATCH_TAG, background="#ffe9a8")
         self.text.tag_configure(SEARCH_CURRENT_TAG, background="#ffc36a")
+        # Tag priorities are stable per widget, so the stacking order is
+        # established once here instead of re-raising on every highlight.
+        self.text.tag_raise(SEARCH_MATCH_TAG)
+        self.text.tag_raise(SEARCH_CURRENT_TAG)
+        self.text.tag_raise(IDENTICAL_MATCH_TAG)
 
         scroll = tk.Scrollbar(
             self.text_frame,
             command=self.text.yview,
             borderwidth=0,
             relief="flat",
-            troughcolor=self.theme["card"],
+            troughcolor=card,
             bg=self.theme["button"],
             activebackground=self.theme["button_hover"],
         )
         scroll.grid(row=0, column=1, sticky="ns", padx=(0, 2), pady=2)
-        self.text.configure(yscrollcommand=scroll.set)
+        self._text_scrollbar = scroll
+        self.text.configure(yscrollcommand=self._on_text_yscroll)
+        self.text.bind("<Configure>", self._on_text_viewport_configure)
 
         self.status_label = tk.Label(
             self.container_frame,
             textvariable=self.status_var,
             anchor="w",
-            bg=self.theme["status"],
-            fg=self.theme["muted"],
+            bg=status,
+            fg=muted,
             padx=10,
             pady=6,
             font=self.ui_font,
@@ -1073,44 +1390,62 @@ class NoteOverlayApp:
         self.text.bind("<<Modified>>", self._on_text_modified)
         self.text.bind("<KeyPress>", self._on_text_keypress)
         self.text.bind("<KeyRelease>", self._on_text_keyrelease)
-        self.text.bind("<Control-v>", self._on_paste)
-        self.text.bind("<Control-V>", self._on_paste)
-        self.text.bind("<Control-b>", self._on_bold_shortcut)
-        self.text.bind("<Control-B>", self._on_bold_shortcut)
-        self.text.bind("<Control-BackSpace>", self._on_ctrl_backspace)
-        self.text.bind("<Control-Shift-B>", self._on_bullet_shortcut)
-        self.text.bind("<Control-Shift-b>", self._on_bullet_shortcut)
-        self.text.bind("<Control-Shift-M>", self._on_mark_identical_shortcut)
-        self.text.bind("<Control-Shift-m>", self._on_mark_identical_shortcut)
-        self.text.bind("<Control-Shift-R>", self._on_replace_identical_shortcut)
-        self.text.bind("<Control-Shift-r>", self._on_replace_identical_shortcut)
-        self.text.bind("<Control-Shift-L>", self._on_spellcheck_shortcut)
-        self.text.bind("<Control-Shift-l>", self._on_spellcheck_shortcut)
-        self.text.bind("<Control-f>", self._on_find_shortcut)
-        self.text.bind("<Control-h>", self._on_replace_shortcut)
-        self.text.bind("<Control-m>", self._on_formula_shortcut)
-        self.text.bind("<Control-M>", self._on_formula_shortcut)
-        self.text.bind("<Control-comma>", self._on_settings_shortcut)
-        self.text.bind("<F1>", self._on_help_shortcut)
         self.text.bind("<Button-3>", self._on_text_context_menu)
-        self.text.bind("<Tab>", self._on_tab_indent)
-        self.text.bind("<Shift-Tab>", self._on_shift_tab_outdent)
-        self.text.bind("<ISO_Left_Tab>", self._on_shift_tab_outdent)
-        self.text.bind("<Return>", self._on_return)
-        self.root.bind("<Control-s>", self._on_ctrl_s)
-        self.root.bind("<Control-f>", self._on_find_shortcut)
-        self.root.bind("<Control-h>", self._on_replace_shortcut)
-        self.root.bind("<Control-m>", self._on_formula_shortcut)
-        self.root.bind("<Control-M>", self._on_formula_shortcut)
-        self.root.bind("<Control-Shift-f>", self._on_focus_mode_shortcut)
-        self.root.bind("<Control-Shift-F>", self._on_focus_mode_shortcut)
-        self.root.bind("<Control-Shift-t>", self._on_toc_shortcut)
-        self.root.bind("<Control-Shift-T>", self._on_toc_shortcut)
-        self.root.bind("<Control-Shift-L>", self._on_spellcheck_shortcut)
-        self.root.bind("<Control-Shift-l>", self._on_spellcheck_shortcut)
-        self.root.bind("<Control-comma>", self._on_settings_shortcut)
-        self.root.bind("<F1>", self._on_help_shortcut)
-        self.root.bind("<Escape>", self._on_escape)
+
+        # Text-widget shortcuts stay on self.text so "break" can suppress the
+        # Text class bindings (Ctrl+F/Ctrl+M have emacs/Return defaults);
+        # the root copies cover focus outside the text field.
+        text_shortcuts = (
+            (("<Control-v>", "<Control-V>"), self._on_paste),
+            (("<Control-b>", "<Control-B>"), self._on_bold_shortcut),
+            (("<Control-BackSpace>",), self._on_ctrl_backspace),
+            (("<Control-Shift-B>", "<Control-Shift-b>"), self._on_bullet_shortcut),
+            (
+                ("<Control-Shift-M>", "<Control-Shift-m>"),
+                self._on_mark_identical_shortcut,
+            ),
+            (
+                ("<Control-Shift-R>", "<Control-Shift-r>"),
+                self._on_replace_identical_shortcut,
+            ),
+            (("<Control-Shift-L>", "<Control-Shift-l>"), self._on_spellcheck_shortcut),
+            (("<Control-f>",), self._on_find_shortcut),
+            (("<Control-h>",), self._on_replace_shortcut),
+            (("<Control-m>", "<Control-M>"), self._on_formula_shortcut),
+            (("<Control-comma>",), self._on_settings_shortcut),
+            (("<F1>",), self._on_help_shortcut),
+            (("<Tab>",), self._on_tab_indent),
+            (("<Shift-Tab>", "<ISO_Left_Tab>"), self._on_shift_tab_outdent),
+            (("<Return>",), self._on_return),
+        )
+        root_shortcuts = (
+            (("<Control-s>",), self._on_ctrl_s),
+            (("<Control-f>",), self._on_find_shortcut),
+            (("<Control-h>",), self._on_replace_shortcut),
+            (("<Control-m>", "<Control-M>"), self._on_formula_shortcut),
+            (("<Control-Shift-f>", "<Control-Shift-F>"), self._on_focus_mode_shortcut),
+            (("<Control-Shift-t>", "<Control-Shift-T>"), self._on_toc_shortcut),
+            (("<Control-Shift-L>", "<Control-Shift-l>"), self._on_spellcheck_shortcut),
+            (("<Control-comma>",), self._on_settings_shortcut),
+            (("<F1>",), self._on_help_shortcut),
+            (("<Escape>",), self._on_escape),
+        )
+        for widget, shortcuts in (
+            (self.text, text_shortcuts),
+            (self.root, root_shortcuts),
+        ):
+            for sequences, handler in shortcuts:
+                self._bind_shortcut(widget, sequences, handler)
+
+    def _bind_shortcut(self, widget, sequences, handler):
+        # Case variants of the same shortcut reuse one registered Tcl
+        # callback: re-binding the readback script skips a second command
+        # wrapper per sequence.
+        widget.bind(sequences[0], handler)
+        if len(sequences) > 1:
+            script = widget.bind(sequences[0])
+            for sequence in sequences[1:]:
+                widget.bind(sequence, script)
 
     def _on_ctrl_s(self, _event):
         self._save_session(silent=False)
@@ -1160,6 +1495,14 @@ class NoteOverlayApp:
         )
 
     def show_settings(self):
+        # Theme colors as locals: these run once per window but touch
+        # dozens of widget kwargs.
+        theme = self.theme
+        bg = theme["bg"]
+        card = theme["card"]
+        card_soft = theme["card_soft"]
+        text_color = theme["text"]
+        border = theme["border"]
         if self._settings_window is not None and self._settings_window.winfo_exists():
             self._settings_window.deiconify()
             self._settings_window.lift()
@@ -1171,14 +1514,14 @@ class NoteOverlayApp:
         win.title("Innstillinger")
         win.geometry("420x320+740+90")
         win.attributes("-topmost", True)
-        win.configure(bg=self.theme["bg"])
+        win.configure(bg=bg)
 
         panel = tk.Frame(
             win,
-            bg=self.theme["card"],
+            bg=card,
             highlightthickness=1,
-            highlightbackground=self.theme["border"],
-            highlightcolor=self.theme["border"],
+            highlightbackground=border,
+            highlightcolor=border,
         )
         panel.pack(fill="both", expand=True, padx=10, pady=10)
 
@@ -1188,39 +1531,31 @@ class NoteOverlayApp:
         height_var = tk.IntVar(value=int(self.settings.get("window_height", 540)))
         pdf_spacing_var = tk.DoubleVar(value=float(self.pdf_line_spacing))
 
-        tk.Label(
-            panel, text="Transparens (%)", bg=self.theme["card"], fg=self.theme["text"], font=self.ui_font
-        ).grid(row=0, column=0, sticky="w", padx=12, pady=(12, 4))
+        tk.Label(panel, text="Transparens (%)", **self._card_label_kw).grid(row=0, column=0, sticky="w", padx=12, pady=(12, 4))
         tk.Scale(
             panel,
             from_=55,
             to=98,
             orient="horizontal",
             variable=alpha_var,
-            bg=self.theme["card"],
-            fg=self.theme["text"],
-            troughcolor=self.theme["card_soft"],
+            bg=card,
+            fg=text_color,
+            troughcolor=card_soft,
             highlightthickness=0,
             length=240,
         ).grid(row=1, column=0, columnspan=2, sticky="w", padx=10)
 
-        tk.Label(
-            panel, text="Autosave (sek)", bg=self.theme["card"], fg=self.theme["text"], font=self.ui_font
-        ).grid(row=2, column=0, sticky="w", padx=12, pady=(10, 2))
+        tk.Label(panel, text="Autosave (sek)", **self._card_label_kw).grid(row=2, column=0, sticky="w", padx=12, pady=(10, 2))
         tk.Spinbox(
             panel,
             from_=1,
             to=60,
             textvariable=autosave_var,
             width=6,
-            relief="flat",
-            borderwidth=1,
-            bg=self.theme["card_soft"],
+            **self._spinbox_kw,
         ).grid(row=2, column=1, sticky="w", padx=6)
 
-        tk.Label(
-            panel, text="Vindusbredde", bg=self.theme["card"], fg=self.theme["text"], font=self.ui_font
-        ).grid(row=3, column=0, sticky="w", padx=12, pady=(8, 2))
+        tk.Label(panel, text="Vindusbredde", **self._card_label_kw).grid(row=3, column=0, sticky="w", padx=12, pady=(8, 2))
         tk.Spinbox(
             panel,
             from_=560,
@@ -1228,14 +1563,10 @@ class NoteOverlayApp:
             increment=20,
             textvariable=width_var,
             width=8,
-            relief="flat",
-            borderwidth=1,
-            bg=self.theme["card_soft"],
+            **self._spinbox_kw,
         ).grid(row=3, column=1, sticky="w", padx=6)
 
-        tk.Label(
-            panel, text="Vindushøyde", bg=self.theme["card"], fg=self.theme["text"], font=self.ui_font
-        ).grid(row=4, column=0, sticky="w", padx=12, pady=(8, 2))
+        tk.Label(panel, text="Vindushøyde", **self._card_label_kw).grid(row=4, column=0, sticky="w", padx=12, pady=(8, 2))
         tk.Spinbox(
             panel,
             from_=420,
@@ -1243,18 +1574,10 @@ class NoteOverlayApp:
             increment=20,
             textvariable=height_var,
             width=8,
-            relief="flat",
-            borderwidth=1,
-            bg=self.theme["card_soft"],
+            **self._spinbox_kw,
         ).grid(row=4, column=1, sticky="w", padx=6)
 
-        tk.Label(
-            panel,
-            text="PDF linjeavstand",
-            bg=self.theme["card"],
-            fg=self.theme["text"],
-            font=self.ui_font,
-        ).grid(row=5, column=0, sticky="w", padx=12, pady=(8, 2))
+        tk.Label(panel, text="PDF linjeavstand", **self._card_label_kw).grid(row=5, column=0, sticky="w", padx=12, pady=(8, 2))
         tk.Scale(
             panel,
             from_=1.15,
@@ -1262,9 +1585,9 @@ class NoteOverlayApp:
             resolution=0.05,
             orient="horizontal",
             variable=pdf_spacing_var,
-            bg=self.theme["card"],
-            fg=self.theme["text"],
-            troughcolor=self.theme["card_soft"],
+            bg=card,
+            fg=text_color,
+            troughcolor=card_soft,
             highlightthickness=0,
             length=180,
         ).grid(row=5, column=1, sticky="w", padx=6)
@@ -1290,7 +1613,7 @@ class NoteOverlayApp:
             self._settings_window = None
             win.destroy()
 
-        button_row = tk.Frame(panel, bg=self.theme["card"])
+        button_row = tk.Frame(panel, bg=card)
         button_row.grid(row=6, column=0, columnspan=2, sticky="e", padx=10, pady=(14, 10))
         self._create_button(button_row, "Lagre", apply_settings).pack(side="right")
         self._create_button(button_row, "Lukk", close_window).pack(side="right", padx=(0, 6))
@@ -1298,16 +1621,26 @@ class NoteOverlayApp:
         win.protocol("WM_DELETE_WINDOW", close_window)
 
     def _word_at_index(self, index):
-        line_start = self.text.index(f"{index} linestart")
-        line_end = self.text.index(f"{index} lineend")
-        line_text = self.text.get(line_start, line_end)
-        column = int(index.split(".")[1])
+        line_no, column = map(int, self.text.index(index).split("."))
+        line_text = self.text.get(f"{line_no}.0", f"{line_no}.end")
+
+        # Only characters adjacent to the click can belong to the word, so
+        # the pattern runs on that slice instead of the whole line.
+        left = column
+        while left > 0 and (
+            line_text[left - 1].isalpha() or line_text[left - 1] in "'-"
+        ):
+            left -= 1
+        right = column
+        length = len(line_text)
+        while right < length and (
+            line_text[right].isalpha() or line_text[right] in "'-"
+        ):
+            right += 1
 
-        for match in SPELLCHECK_WORD_PATTERN.finditer(line_text):
+        for match in SPELLCHECK_WORD_PATTERN.finditer(line_text, left, right):
             if match.start() <= column <= match.end():
-                start = f"{line_start}+{match.start()}c"
-                end = f"{line_start}+{match.end()}c"
-                return match.group(0), start, end
+                return match.group(0), f"{line_no}.{match.start()}", f"{line_no}.{match.end()}"
         return "", "", ""
 
     def _add_word_to_dictionary(self, word):
@@ -1320,9 +1653,10 @@ class NoteOverlayApp:
             return
 
         self._user_spell_words.add(normalized)
-        self.custom_spell_words.add(normalized)
+        self.custom_spell_words = self.custom_spell_words | {normalized}
+        self._word_verdict_cache.clear()
         self._save_user_dictionary_words()
-        self._schedule_spellcheck()
+        self._schedule_spellcheck(force_full=True)
         self._set_status(f"La til '{word}' i personlig ordbok.")
 
     def _on_text_context_menu(self, event):
@@ -1334,27 +1668,38 @@ class NoteOverlayApp:
             self.text.tag_remove("sel", "1.0", "end")
             self.text.tag_add("sel", word_start, word_end)
 
-        menu = tk.Menu(self.root, tearoff=0)
+        # One shared menu: only the dictionary entry changes per click, so
+        # the static items are built a single time.
+        if self._context_menu is None:
+            menu = tk.Menu(self.root, tearoff=0)
+            menu.add_command(label="Legg til i ordbok", state="disabled")
+            menu.add_separator()
+            menu.add_command(label="Sett inn formel", command=self.insert_formula)
+            menu.add_separator()
+            menu.add_command(label="Søk", command=lambda: self.open_search_panel(False))
+            menu.add_command(label="Erstatt like", command=self.replace_identical)
+            menu.add_command(label="Marker like", command=self.mark_identical)
+            self._context_menu = menu
+        menu = self._context_menu
+
         if word:
             normalized = word.casefold().strip()
             if normalized in self.custom_spell_words:
-                menu.add_command(label=f"I ordbok: {word}", state="disabled")
+                menu.entryconfigure(
+                    0, label=f"I ordbok: {word}", state="disabled", command=""
+                )
             else:
-                menu.add_command(
+                menu.entryconfigure(
+                    0,
                     label=f"Legg til i ordbok: {word}",
+                    state="normal",
                     command=lambda w=word: self._add_word_to_dictionary(w),
                 )
         else:
-            menu.add_command(label="Legg til i ordbok", state="disabled")
-
-        menu.add_separator()
-        menu.add_command(label="Sett inn formel", command=self.insert_formula)
-        menu.add_separator()
-        menu.add_command(label="Søk", command=lambda: self.open_search_panel(False))
-        menu.add_command(label="Erstatt like", command=self.replace_identical)
-        menu.add_command(label="Marker like", command=self.mark_identical)
+            menu.entryconfigure(
+                0, label="Legg til i ordbok", state="disabled", command=""
+            )
 
-        self._context_menu = menu
         try:
             menu.tk_popup(event.x_root, event.y_root)
         finally:
@@ -1450,28 +1795,57 @@ class NoteOverlayApp:
         self.text.tag_remove(SEARCH_MATCH_TAG, "1.0", "end")
         self.text.tag_remove(SEARCH_CURRENT_TAG, "1.0", "end")
         self._search_match_ranges = []
+        self._search_match_start_lines = []
+        self._search_viewport_mode = False
         self._search_current_idx = -1
+        self._last_search_key = None
+
+    def _on_text_yscroll(self, first, last):
+        self._text_scrollbar.set(first, last)
+        if self._search_viewport_mode:
+            self._retag_visible_matches()
+
+    def _on_text_viewport_configure(self, _event):
+        if self._search_viewport_mode:
+            self._retag_visible_matches()
+
+    def _retag_visible_matches(self):
+        # With huge match sets only the viewport is tagged; scrolling re-tags
+        # the slice of matches whose start line is currently on screen.
+        if not self._search_match_ranges:
+            return
+        top_line = int(self.text.index("@0,0").split(".")[0])
+        bottom_line = int(
+            self.text.index(f"@0,{self.text.winfo_height()}").split(".")[0]
+        )
+        lo = bisect_left(self._search_match_start_lines, top_line)
+        hi = bisect_right(self._search_match_start_lines, bottom_line + 1)
+        self.text.tag_remove(SEARCH_MATCH_TAG, "1.0", "end")
+        self._tag_add_ranges(SEARCH_MATCH_TAG, self._search_match_ranges[lo:hi])
 
     def _find_search_matches(self):
         needle = self.search_var.get()
         if not needle:
             return []
 
+        # One cached snapshot plus a C-level str.find scan instead of
+        # repeated Tk searches, which re-walk the widget from scratch per
+        # treff.
+        if self.search_case_var.get():
+            haystack = self._get_full_text()
+        else:
+            haystack = self._get_full_text_lower()
+            needle = needle.lower()
+        line_starts = self._text_cache_line_starts
+        needle_len = len(needle)
+
         matches = []
-        start = "1.0"
-        while True:
-            pos = self.text.search(
-                needle,
-                start,
-                stopindex="end",
-                exact=True,
-                nocase=0 if self.search_case_var.get() else 1,
-            )
-            if not pos:
-                break
-            end = self.text.index(f"{pos}+{len(needle)}c")
-            matches.append((pos, end))
-            start = end
+        idx = haystack.find(needle)
+        while idx != -1:
+            start = self._offset_to_tk_index(idx, line_starts)
+            end = self._offset_to_tk_index(idx + needle_len, line_starts)
+            matches.append((start, end))
+            idx = haystack.find(needle, idx + needle_len)
         return matches
 
     def _focus_current_search_match(self):
@@ -1485,52 +1859,87 @@ class NoteOverlayApp:
 
         start, end = self._search_match_ranges[self._search_current_idx]
         self.text.tag_add(SEARCH_CURRENT_TAG, start, end)
-        self.text.tag_raise(SEARCH_CURRENT_TAG)
-        self.text.tag_raise(IDENTICAL_MATCH_TAG)
         self.text.mark_set("insert", end)
         self.text.see(start)
         self.text.tag_remove("sel", "1.0", "end")
         self.text.tag_add("sel", start, end)
 
     def _refresh_search_matches(self):
+        if self._search_debounce_id is not None:
+            self.root.after_cancel(self._search_debounce_id)
+            self._search_debounce_id = None
         needle = self.search_var.get()
+
+        # Same needle, case mode and text since last compute: the existing
+        # highlights are still valid.
+        search_key = (needle, self.search_case_var.get(), self._text_version)
+        if search_key == self._last_search_key and self._search_match_ranges:
+            self._focus_current_search_match()
+            return
         self.text.tag_remove(SEARCH_MATCH_TAG, "1.0", "end")
         self.text.tag_remove(SEARCH_CURRENT_TAG, "1.0", "end")
         self._search_match_ranges = []
         self._search_current_idx = -1
 
+        self._last_search_key = None
+
         if not needle:
             self._set_status("Søkefelt tomt.")
             return
 
         self._search_match_ranges = self._find_search_matches()
-        for start, end in self._search_match_ranges:
-            self.text.tag_add(SEARCH_MATCH_TAG, start, end)
-        self.text.tag_raise(SEARCH_MATCH_TAG)
-        self.text.tag_raise(IDENTICAL_MATCH_TAG)
+        self._last_search_key = search_key
+        self._search_match_start_lines = [
+            int(start.split(".")[0]) for start, _end in self._search_match_ranges
+        ]
+        self._search_viewport_mode = (
+            len(self._search_match_ranges) > SEARCH_VIEWPORT_TAG_THRESHOLD
+        )
+        if self._search_viewport_mode:
+            self._retag_visible_matches()
+        else:
+            self._tag_add_ranges(SEARCH_MATCH_TAG, self._search_match_ranges)
 
         if self._search_match_ranges:
-            insert_idx = self.text.index("insert")
-            self._search_current_idx = 0
-            for i, (start, _end) in enumerate(self._search_match_ranges):
-                if self.text.compare(start, ">=", insert_idx):
-                    self._search_current_idx = i
-                    break
+            # First match at or after the cursor, found by bisecting the
+            # sorted (line, column) pairs instead of text.compare per match.
+            insert_pos = tuple(map(int, self.text.index("insert").split(".")))
+            starts = [
+                tuple(map(int, start.split(".")))
+                for start, _end in self._search_match_ranges
+            ]
+            self._search_current_idx = bisect_left(starts, insert_pos) % len(starts)
             self._focus_current_search_match()
             self._set_status(f"Fant {len(self._search_match_ranges)} treff.")
         else:
             self._set_status("Fant ingen treff.")
 
     def _on_search_query_changed(self, _event):
-        self._refresh_search_matches()
+        # Debounce keystrokes so half-typed queries don't trigger a full
+        # document scan and re-tagging per tast.
+        if self._search_debounce_id is not None:
+            self.root.after_cancel(self._search_debounce_id)
+        self._search_debounce_id = self.root.after(
+            SEARCH_DEBOUNCE_MS, self._refresh_search_matches
+        )
+
+    def _ensure_search_matches_fresh(self):
+        # Debouncen kan la _search_match_ranges ligge igjen for forrige
+        # søkestreng; Enter innenfor vinduet må ikke bruke gamle treff.
+        search_key = (
+            self.search_var.get(),
+            self.search_case_var.get(),
+            self._text_version,
+        )
+        if search_key != self._last_search_key or not self._search_match_ranges:
+            self._refresh_search_matches()
 
     def search_next(self):
         if not self.search_var.get():
             self.open_search_panel(replace_mode=False)
             return
 
-        if not self._search_match_ranges:
-            self._refresh_search_matches()
+        self._ensure_search_matches_fresh()
         if not self._search_match_ranges:
             return
 
@@ -1544,8 +1953,7 @@ class NoteOverlayApp:
             self.open_search_panel(replace_mode=False)
             return
 
-        if not self._search_match_ranges:
-            self._refresh_search_matches()
+        self._ensure_search_matches_fresh()
         if not self._search_match_ranges:
             return
 
@@ -1560,8 +1968,7 @@ class NoteOverlayApp:
             self.open_search_panel(replace_mode=True)
             return
 
-        if not self._search_match_ranges:
-            self._refresh_search_matches()
+        self._ensure_search_matches_fresh()
         if not self._search_match_ranges:
             return
 
@@ -1573,36 +1980,151 @@ class NoteOverlayApp:
         else:
             self.text.mark_set("insert", start)
 
-        self._dirty = True
+        self._mark_dirty()
+        self._invalidate_text_cache()
         self._schedule_spellcheck()
         self._refresh_search_matches()
 
+    @contextmanager
+    def _bulk_edit(self):
+        # Groups a burst of delete/insert calls into one undo step and one
+        # <<Modified>> round, so redraw bookkeeping and the spellcheck
+        # debounce fire once per batch instead of per edit.
+        self._suppress_modified = True
+        self.text.configure(autoseparators=False)
+        self.text.edit_separator()
+        try:
+            yield
+        finally:
+            self.text.edit_separator()
+            self.text.configure(autoseparators=True)
+            self._suppress_modified = False
+            self._on_text_modified(None)
+
+    def _format_spans_by_line(self, tags):
+        # Clip every bold/superscript range onto the lines it covers so the
+        # spans can be re-applied after a line is rewritten.
+        spans = {tag: {} for tag in tags}
+        for tag in tags:
+            per_line = spans[tag]
+            ranges = self.text.tag_ranges(tag)
+            for i in range(0, len(ranges), 2):
+                start_line, start_col = map(int, str(ranges[i]).split("."))
+                end_line, end_col = map(int, str(ranges[i + 1]).split("."))
+                for line in range(start_line, end_line + 1):
+                    first = start_col if line == start_line else 0
+                    last = end_col if line == end_line else None
+                    per_line.setdefault(line, []).append((first, last))
+        return spans
+
+    def _replace_ranges_by_line(self, ranges, replacement):
+        # One delete+insert per affected line instead of per match; many
+        # matches on the same long line otherwise pay O(line) per edit.
+        by_line = {}
+        for start, end in ranges:
+            line, start_col = map(int, start.split("."))
+            end_col = int(end.split(".")[1])
+            by_line.setdefault(line, []).append((start_col, end_col))
+
+        format_spans = self._format_spans_by_line((BOLD_TAG, SUPERSCRIPT_TAG))
+        repl_len = len(replacement)
+
+        def remap(col, match_spans):
+            shift = 0
+            for start_col, end_col in match_spans:
+                if col >= end_col:
+                    shift += repl_len - (end_col - start_col)
+                elif col > start_col:
+                    return start_col + shift + min(repl_len, col - start_col)
+                else:
+                    break
+            return col + shift
+
+        with self._bulk_edit():
+            self._replace_lines(by_line, replacement, format_spans, remap)
+
+    def _replace_spans_keep_embeds(self, line, match_spans, replacement):
+        # Linjer med innebygde bilder kan ikke skjøtes som hele linjer:
+        # text.get-snapshotet mangler bildetegnet, så en hel-linje-splice
+        # sletter selve bildet og mister elide-taggen på tokenet. Ta hvert
+        # treff for seg med Tk-indekser i stedet.
+        for start_col, end_col in sorted(match_spans, reverse=True):
+            self.text.delete(f"{line}.{start_col}", f"{line}.{end_col}")
+            if replacement:
+                self.text.insert(f"{line}.{start_col}", replacement)
+        self._reassert_hidden_token_tags(line)
+
+    def _reassert_hidden_token_tags(self, line):
+        # Redigering inntil et skjult [[IMG:...]]-token kan la innsatt tekst
+        # arve eller forskyve elide-taggen; dekk tokenene på nytt.
+        idx = self.text.search("[[IMG:", f"{line}.0", stopindex=f"{line}.end")
+        while idx:
+            end_idx = self.text.search("]]", idx, stopindex=f"{line}.end")
+            if not end_idx:
+                break
+            self.text.tag_add(IMAGE_TOKEN_HIDDEN_TAG, idx, f"{end_idx}+2c")
+            idx = self.text.search(
+                "[[IMG:", f"{end_idx}+2c", stopindex=f"{line}.end"
+            )
+
+    def _replace_lines(self, by_line, replacement, format_spans, remap):
+        image_cols = self._embedded_image_columns()
+        for line in sorted(by_line, reverse=True):
+            match_spans = by_line[line]
+            if image_cols.get(line):
+                self._replace_spans_keep_embeds(line, match_spans, replacement)
+                continue
+            line_text = self.text.get(f"{line}.0", f"{line}.end")
+            parts = []
+            cursor = 0
+            for start_col, end_col in match_spans:
+                parts.append(line_text[cursor:start_col])
+                parts.append(replacement)
+                cursor = end_col
+            parts.append(line_text[cursor:])
+
+            self.text.delete(f"{line}.0", f"{line}.end")
+            self.text.insert(f"{line}.0", "".join(parts))
+
+            for tag, per_line in format_spans.items():
+                for first, last in per_line.get(line, ()):
+                    if last is None:
+                        last = len(line_text)
+                    new_first = remap(first, match_spans)
+                    new_last = remap(last, match_spans)
+                    if new_last > new_first:
+                        self.text.tag_add(tag, f"{line}.{new_first}", f"{line}.{new_last}")
+
     def replace_all_matches(self):
         replacement = self.replace_var.get()
         if not self.search_var.get():
             self.open_search_panel(replace_mode=True)
             return
 
-        if not self._search_match_ranges:
-            self._refresh_search_matches()
+        self._ensure_search_matches_fresh()
         if not self._search_match_ranges:
             return
 
         count = len(self._search_match_ranges)
-        for start, end in reversed(self._search_match_ranges):
-            self.text.delete(start, end)
-            if replacement:
-                self.text.insert(start, replacement)
+        needle = self.search_var.get()
+        if "\n" in needle or "\n" in replacement:
+            # Treff over linjegrenser passer ikke i linjevis skjøting.
+            with self._bulk_edit():
+                for start, end in reversed(self._search_match_ranges):
+                    self.text.delete(start, end)
+                    if replacement:
+                        self.text.insert(start, replacement)
+        else:
+            self._replace_ranges_by_line(self._search_match_ranges, replacement)
 
-        self._dirty = True
+        self._mark_dirty()
+        self._invalidate_text_cache()
         self._schedule_spellcheck()
         self._refresh_search_matches()
         self._set_status(f"Ersattet {count} treff.")
 
-    def _line_is_heading_candidate(self, line_no):
-        line_start = f"{line_no}.0"
-        line_end = f"{line_no}.end"
-        line_text = self.text.get(line_start, line_end).strip()
+    def _line_is_heading_candidate(self, raw_line, bold_letters):
+        line_text = raw_line.strip()
         if not line_text:
             return None
         if self._parse_bullet_line(line_text):
@@ -1612,28 +2134,52 @@ class NoteOverlayApp:
         if len(line_text) > 110:
             return None
 
-        total_letters = 0
-        bold_letters = 0
-        raw_line = self.text.get(line_start, line_end)
-        for i, ch in enumerate(raw_line):
-            if not ch.isalpha():
-                continue
-            total_letters += 1
-            idx = self.text.index(f"{line_start}+{i}c")
-            if BOLD_TAG in self.text.tag_names(idx):
-                bold_letters += 1
-
+        total_letters = sum(1 for ch in raw_line if ch.isalpha())
         if total_letters >= 3 and bold_letters / max(total_letters, 1) >= 0.8:
             return line_text
         return None
 
+    def _bold_letters_by_line(self, full_text, line_starts):
+        # One tag_ranges call for the whole document; the spans are mapped
+        # onto line numbers with pure-Python offset arithmetic instead of
+        # per-character index/tag_names round-trips.
+        counts = {}
+        ranges = self.text.tag_ranges(BOLD_TAG)
+        for i in range(0, len(ranges), 2):
+            start_off = self._tk_index_to_offset(str(ranges[i]), line_starts)
+            end_off = self._tk_index_to_offset(str(ranges[i + 1]), line_starts)
+            line = bisect_right(line_starts, start_off) - 1
+            while start_off < end_off:
+                if line + 1 < len(line_starts):
+                    line_end = line_starts[line + 1] - 1
+                else:
+                    line_end = len(full_text)
+                segment = full_text[start_off : min(end_off, line_end)]
+                letters = sum(1 for ch in segment if ch.isalpha())
+                if letters:
+                    counts[line + 1] = counts.get(line + 1, 0) + letters
+                line += 1
+                if line >= len(line_starts):
+                    break
+                start_off = line_starts[line]
+        return counts
+
     def _build_toc_entries(self):
+        # Rebuilt lazily; _on_text_modified drops the cache so reopening the
+        # TOC or clicking Oppdater on unchanged text is free.
+        if self._toc_cache is not None:
+            return self._toc_cache
         entries = []
-        line_count = int(self.text.index("end-1c").split(".")[0])
-        for line_no in range(1, line_count + 1):
-            heading = self._line_is_heading_candidate(line_no)
+        heading_for_line = self._line_is_heading_candidate
+        append = entries.append
+        full_text = self._get_full_text()
+        line_starts = self._text_cache_line_starts
+        bold_by_line = self._bold_letters_by_line(full_text, line_starts)
+        for line_no, raw_line in enumerate(full_text.split("\n"), start=1):
+            heading = heading_for_line(raw_line, bold_by_line.get(line_no, 0))
             if heading:
-                entries.append((line_no, heading))
+                append((line_no, heading))
+        self._toc_cache = entries
         return entries
 
     def _refresh_toc_listbox(self):
@@ -1662,6 +2208,13 @@ class NoteOverlayApp:
         self._set_status(f"Hoppet til linje {line_no}: {heading[:40]}")
 
     def show_toc(self):
+        # Theme colors as locals: these run once per window but touch
+        # dozens of widget kwargs.
+        theme = self.theme
+        bg = theme["bg"]
+        card = theme["card"]
+        text_color = theme["text"]
+        border = theme["border"]
         if self._toc_window is not None and self._toc_window.winfo_exists():
             self._refresh_toc_listbox()
             self._toc_window.deiconify()
@@ -1673,24 +2226,24 @@ class NoteOverlayApp:
         self._toc_window.title("Innhold")
         self._toc_window.geometry("420x420+720+60")
         self._toc_window.attributes("-topmost", True)
-        self._toc_window.configure(bg=self.theme["bg"])
+        self._toc_window.configure(bg=bg)
 
         panel = tk.Frame(
             self._toc_window,
-            bg=self.theme["card"],
+            bg=card,
             highlightthickness=1,
-            highlightbackground=self.theme["border"],
-            highlightcolor=self.theme["border"],
+            highlightbackground=border,
+            highlightcolor=border,
         )
         panel.pack(fill="both", expand=True, padx=10, pady=10)
 
-        top = tk.Frame(panel, bg=self.theme["card"])
+        top = tk.Frame(panel, bg=card)
         top.pack(fill="x")
         tk.Label(
             top,
             text="Innholdsfortegnelse",
-            bg=self.theme["card"],
-            fg=self.theme["text"],
+            bg=card,
+            fg=text_color,
             font=self.title_font,
             padx=8,
             pady=6,
@@ -1699,14 +2252,14 @@ class NoteOverlayApp:
         btn_refresh = self._create_button(top, "Oppdater", self._refresh_toc_listbox)
         btn_refresh.pack(side="right", padx=6)
 
-        list_frame = tk.Frame(panel, bg=self.theme["card"])
+        list_frame = tk.Frame(panel, bg=card)
         list_frame.pack(fill="both", expand=True, padx=6, pady=(0, 6))
 
         self._toc_listbox = tk.Listbox(
             list_frame,
             font=self.ui_font,
-            bg=self.theme["card"],
-            fg=self.theme["text"],
+            bg=card,
+            fg=text_color,
             selectbackground="#d8e6ff",
             relief="flat",
             borderwidth=0,
@@ -1742,12 +2295,8 @@ class NoteOverlayApp:
         if not before_cursor:
             return "break"
 
-        cut_index = len(before_cursor)
-        while cut_index > 0 and before_cursor[cut_index - 1].isspace():
-            cut_index -= 1
-        while cut_index > 0 and not before_cursor[cut_index - 1].isspace():
-            cut_index -= 1
-
+        match = LAST_WORD_PATTERN.search(before_cursor)
+        cut_index = match.start() if match else 0
         delete_count = len(before_cursor) - cut_index
         if delete_count > 0:
             self.text.delete(f"insert-{delete_count}c", "insert")
@@ -1766,42 +2315,13 @@ class NoteOverlayApp:
         if not text:
             return insert_at
         self.text.insert(insert_at, text)
-        run_end = self.text.index(f"{insert_at}+{len(text)}c")
+        run_end = self._index_after(insert_at, text)
         self.text.tag_add(BOLD_TAG, insert_at, run_end)
         self.text.mark_set("insert", run_end)
         return run_end
 
     def _is_navigation_or_modifier_key(self, keysym):
-        return keysym in {
-            "BackSpace",
-            "Delete",
-            "Left",
-            "Right",
-            "Up",
-            "Down",
-            "Home",
-            "End",
-            "Page_Up",
-            "Page_Down",
-            "Insert",
-            "Escape",
-            "Tab",
-            "Return",
-            "KP_Enter",
-            "Shift_L",
-            "Shift_R",
-            "Control_L",
-            "Control_R",
-            "Alt_L",
-            "Alt_R",
-            "Meta_L",
-            "Meta_R",
-            "Super_L",
-            "Super_R",
-            "Caps_Lock",
-            "Num_Lock",
-            "Scroll_Lock",
-        }
+        return keysym in NAV_MOD_KEYSYMS
 
     def _on_text_keypress(self, event):
         if not self.bold_typing_mode:
@@ -1829,7 +2349,7 @@ class NoteOverlayApp:
 
         self._insert_plain_with_bold(event.char, insert_at)
         self.text.see("insert")
-        self._dirty = True
+        self._mark_dirty()
         self._schedule_spellcheck()
         return "break"
 
@@ -1855,13 +2375,13 @@ class NoteOverlayApp:
                 "^{", close_char_start, stopindex=line_start, backwards=True
             )
             if marker:
-                content_start = self.text.index(f"{marker}+2c")
+                content_start = self._index_after(marker, "^{")
                 if self.text.compare(content_start, "<", close_char_start):
                     content = self.text.get(content_start, close_char_start)
                     if content and "\n" not in content:
                         self.text.delete(close_char_start, insert_at)
-                        self.text.delete(marker, f"{marker}+2c")
-                        sup_end = self.text.index(f"{marker}+{len(content)}c")
+                        self.text.delete(marker, content_start)
+                        sup_end = self._index_after(marker, content)
                         self.text.tag_add(SUPERSCRIPT_TAG, marker, sup_end)
                         self.text.mark_set("insert", sup_end)
                         return True
@@ -1870,15 +2390,16 @@ class NoteOverlayApp:
             return False
 
         marker_start = self.text.index(f"{insert_at}-2c")
-        marker = self.text.get(marker_start, f"{marker_start}+1c")
-        candidate = self.text.get(f"{marker_start}+1c", insert_at)
+        marker_end = self._index_after(marker_start, "^")
+        marker = self.text.get(marker_start, marker_end)
+        candidate = self.text.get(marker_end, insert_at)
         if marker != "^":
             return False
         if not self._is_superscript_candidate_char(candidate):
             return False
 
-        self.text.delete(marker_start, f"{marker_start}+1c")
-        sup_end = self.text.index(f"{marker_start}+1c")
+        self.text.delete(marker_start, marker_end)
+        sup_end = self._index_after(marker_start, candidate)
         self.text.tag_add(SUPERSCRIPT_TAG, marker_start, sup_end)
         self.text.mark_set("insert", sup_end)
         return True
@@ -1893,19 +2414,34 @@ class NoteOverlayApp:
         if self._is_navigation_or_modifier_key(event.keysym):
             return None
 
+        # Bare "}" eller et mulig hevet tegn kan fullføre ^x / ^{...};
+        # alt annet slipper Tcl-oppslagene i auto-formateringen.
+        ch = event.char
+        if ch != "}" and not self._is_superscript_candidate_char(ch):
+            return None
+
         if self._auto_format_superscript_at_cursor():
-            self._dirty = True
+            self._mark_dirty()
             self._schedule_spellcheck()
 
         return None
 
     def _selection_is_fully_bold(self, start, end):
-        index = self.text.index(start)
-        while self.text.compare(index, "<", end):
-            if BOLD_TAG not in self.text.tag_names(index):
+        # Walk the bold spans as offsets instead of stepping the selection
+        # one "+1c" index at a time through Tcl.
+        self._get_full_text()
+        line_starts = self._text_cache_line_starts
+        pos = self._tk_index_to_offset(self.text.index(start), line_starts)
+        end_off = self._tk_index_to_offset(self.text.index(end), line_starts)
+        for span_start, span_end in self._tag_spans_as_offsets(BOLD_TAG, line_starts):
+            if span_end <= pos:
+                continue
+            if span_start > pos:
                 return False
-            index = self.text.index(f"{index}+1c")
-        return True
+            pos = span_end
+            if pos >= end_off:
+                return True
+        return pos >= end_off
 
     def toggle_bold(self):
         try:
@@ -1927,7 +2463,10 @@ class NoteOverlayApp:
             self.text.tag_add(BOLD_TAG, start, end)
             self._set_status("Bold PÅ.")
 
-        self._dirty = True
+        self._mark_dirty()
+        # Tag changes don't fire <<Modified>>, but they can change which
+        # lines qualify as headings.
+        self._toc_cache = None
         self.text.see("insert")
 
     def _on_bullet_shortcut(self, _event):
@@ -1961,31 +2500,122 @@ class NoteOverlayApp:
             return compact
         return compact[: max_len - 3] + "..."
 
+    def _invalidate_text_cache(self):
+        self._text_cache = None
+        self._text_cache_line_starts = None
+        self._text_cache_lower = None
+        self._text_cache_image_cols = None
+        self._text_version += 1
+
+    def _get_full_text(self):
+        # Snapshot of the whole buffer; <<Modified>> (and the replace paths,
+        # which mutate and re-read in the same callback) invalidate it, so
+        # repeated search/export/session reads skip the Tcl round-trip.
+        if self._text_cache is None:
+            self._text_cache = self.text.get("1.0", "end-1c")
+            self._text_cache_line_starts = self._line_start_offsets(self._text_cache)
+            self._text_cache_lower = None
+        return self._text_cache
+
+    def _get_full_text_lower(self):
+        full_text = self._get_full_text()
+        if self._text_cache_lower is None:
+            self._text_cache_lower = full_text.lower()
+        return self._text_cache_lower
+
+    def _line_start_offsets(self, text_value):
+        offsets = [0]
+        idx = text_value.find("\n")
+        while idx != -1:
+            offsets.append(idx + 1)
+            idx = text_value.find("\n", idx + 1)
+        return offsets
+
+    def _embedded_image_columns(self):
+        # Innebygde bilder (image_create) teller som ett tegn i Tk-indekser,
+        # men finnes ikke i text.get-snapshotet; kolonnene deres trengs for
+        # å veksle riktig mellom de to tallrommene.
+        if not self._inline_image_refs:
+            return {}
+        if self._text_cache_image_cols is None:
+            cols = {}
+            for _kind, _name, index in self.text.dump(
+                "1.0", "end-1c", image=True, window=True
+            ):
+                line, _, col = index.partition(".")
+                cols.setdefault(int(line), []).append(int(col))
+            self._text_cache_image_cols = cols
+        return self._text_cache_image_cols
+
+    def _offset_to_tk_index(self, offset, line_starts):
+        line = bisect_right(line_starts, offset) - 1
+        column = offset - line_starts[line]
+        image_cols = self._embedded_image_columns()
+        if image_cols:
+            for image_col in image_cols.get(line + 1, ()):
+                if image_col <= column:
+                    column += 1
+                else:
+                    break
+        return f"{line + 1}.{column}"
+
+    def _tk_index_to_offset(self, index, line_starts):
+        line, _, column = index.partition(".")
+        column = int(column)
+        image_cols = self._embedded_image_columns()
+        if image_cols:
+            # Kolonnene i kartet er Tk-kolonner; tell forskyvningen mot den
+            # opprinnelige kolonnen før den trekkes fra.
+            shift = 0
+            for image_col in image_cols.get(int(line), ()):
+                if image_col < column:
+                    shift += 1
+                else:
+                    break
+            column -= shift
+        return line_starts[int(line) - 1] + column
+
+    def _index_after(self, index, text):
+        # Indeksen rett etter tekst satt inn ved index, uten Tcl-rundtur.
+        line, _, column = index.partition(".")
+        newline_count = text.count("\n")
+        if newline_count:
+            last_line_len = len(text) - text.rfind("\n") - 1
+            return f"{int(line) + newline_count}.{last_line_len}"
+        return f"{line}.{int(column) + len(text)}"
+
     def _find_exact_occurrences(self, token):
         if not token:
             return []
 
-        matches = []
+        # One C-level str.find scan over the cached snapshot instead of
+        # repeated Tk searches, which stall on multi-thousand-line notes.
+        text_value = self._get_full_text()
+        line_starts = self._text_cache_line_starts
         token_len = len(token)
-        search_from = "1.0"
-
-        while True:
-            start = self.text.search(token, search_from, stopindex="end", exact=True)
-            if not start:
-                break
 
-            end = self.text.index(f"{start}+{token_len}c")
+        matches = []
+        idx = text_value.find(token)
+        while idx != -1:
+            start = self._offset_to_tk_index(idx, line_starts)
+            end = self._offset_to_tk_index(idx + token_len, line_starts)
             matches.append((start, end))
-            search_from = end
+            idx = text_value.find(token, idx + token_len)
 
         return matches
 
+    def _tag_add_ranges(self, tag, ranges):
+        # One variadic tag_add per chunk instead of one Tcl call per match;
+        # chunking keeps the command length sane on huge match sets.
+        for i in range(0, len(ranges), TAG_ADD_CHUNK_RANGES):
+            chunk = ranges[i : i + TAG_ADD_CHUNK_RANGES]
+            index_pairs = [index for pair in chunk for index in pair]
+            self.text.tag_add(tag, *index_pairs)
+
     def _highlight_exact_occurrences(self, token):
         self._clear_identical_highlight()
         matches = self._find_exact_occurrences(token)
-        for start, end in matches:
-            self.text.tag_add(IDENTICAL_MATCH_TAG, start, end)
-        self.text.tag_raise(IDENTICAL_MATCH_TAG)
+        self._tag_add_ranges(IDENTICAL_MATCH_TAG, matches)
         return matches
 
     def mark_identical(self):
@@ -2033,12 +2663,17 @@ class NoteOverlayApp:
             self._set_status(f"Ingen endring. Markerte {len(highlighted)} treff.")
             return
 
-        for start, end in reversed(matches):
-            self.text.delete(start, end)
-            if replacement:
-                self.text.insert(start, replacement)
+        if "\n" in token or "\n" in replacement:
+            # Treff over linjegrenser passer ikke i linjevis skjøting.
+            with self._bulk_edit():
+                for start, end in reversed(matches):
+                    self.text.delete(start, end)
+                    if replacement:
+                        self.text.insert(start, replacement)
+        else:
+            self._replace_ranges_by_line(matches, replacement)
 
-        self._dirty = True
+        self._mark_dirty()
         self._schedule_spellcheck()
 
         if replacement:
@@ -2053,13 +2688,9 @@ class NoteOverlayApp:
             self._set_status(f"Slettet {len(matches)} like treff.")
 
     def _bullet_level_from_indent(self, indent_text):
-        width = 0
-        for ch in indent_text:
-            if ch == "\t":
-                width += BULLET_INDENT_SPACES - (width % BULLET_INDENT_SPACES)
-            else:
-                width += 1
-        return max(0, width // BULLET_INDENT_SPACES)
+        # expandtabs ruller tabulatorer frem til neste tabstopp akkurat som
+        # den gamle tegn-for-tegn-løkken, bare i C.
+        return len(indent_text.expandtabs(BULLET_INDENT_SPACES)) // BULLET_INDENT_SPACES
 
     def _bullet_marker_for_level(self, level):
         if level < 0:
@@ -2067,11 +2698,24 @@ class NoteOverlayApp:
         return BULLET_MARKERS[min(level, len(BULLET_MARKERS) - 1)]
 
     def _bullet_prefix_for_level(self, level):
-        return (" " * (max(0, level) * BULLET_INDENT_SPACES)) + self._bullet_marker_for_level(
-            level
-        ) + " "
+        level = max(0, level)
+        prefix = self._bullet_prefix_cache.get(level)
+        if prefix is None:
+            prefix = (
+                " " * (level * BULLET_INDENT_SPACES)
+                + self._bullet_marker_for_level(level)
+                + " "
+            )
+            self._bullet_prefix_cache[level] = prefix
+        return prefix
 
     def _parse_bullet_line(self, line_text):
+        # Cheap C-level prefilter; most lines are not bullets and skip the
+        # regex entirely.
+        stripped = line_text.lstrip(" \t")
+        if not stripped or stripped[0] not in BULLET_PREFIX_CHARS:
+            return None
+
         match = BULLET_LINE_PATTERN.match(line_text)
         if not match:
             return None
@@ -2134,7 +2778,7 @@ class NoteOverlayApp:
 
         next_prefix = bullet_info["indent"] + bullet_info["marker"] + " "
         self.text.insert("insert", "\n" + next_prefix)
-        self._dirty = True
+        self._mark_dirty()
         self._schedule_spellcheck()
         return "break"
 
@@ -2150,7 +2794,7 @@ class NoteOverlayApp:
             self.text.delete(marker_start, marker_end)
             return
 
-        indent = re.match(r"^[ \t]*", line_text).group(0)
+        indent = LEADING_WS_PATTERN.match(line_text).group(0)
         level = self._bullet_level_from_indent(indent)
         marker = self._bullet_marker_for_level(level)
         insert_at = f"{line_start}+{len(indent)}c"
@@ -2160,26 +2804,27 @@ class NoteOverlayApp:
         start_line, end_line = self._selected_line_range()
         changed = 0
 
-        for line_no in range(start_line, end_line + 1):
-            line_start = f"{line_no}.0"
-            line_end = f"{line_no}.end"
-            line_text = self.text.get(line_start, line_end)
-            bullet_info = self._parse_bullet_line(line_text)
-            if not bullet_info:
-                continue
+        with self._bulk_edit():
+            for line_no in range(start_line, end_line + 1):
+                line_start = f"{line_no}.0"
+                line_end = f"{line_no}.end"
+                line_text = self.text.get(line_start, line_end)
+                bullet_info = self._parse_bullet_line(line_text)
+                if not bullet_info:
+                    continue
 
-            new_level = max(0, bullet_info["level"] + delta)
-            if new_level == bullet_info["level"]:
-                continue
+                new_level = max(0, bullet_info["level"] + delta)
+                if new_level == bullet_info["level"]:
+                    continue
 
-            new_prefix = self._bullet_prefix_for_level(new_level)
-            old_prefix_end = f"{line_start}+{bullet_info['prefix_len']}c"
-            self.text.delete(line_start, old_prefix_end)
-            self.text.insert(line_start, new_prefix)
-            changed += 1
+                new_prefix = self._bullet_prefix_for_level(new_level)
+                old_prefix_end = f"{line_start}+{bullet_info['prefix_len']}c"
+                self.text.delete(line_start, old_prefix_end)
+                self.text.insert(line_start, new_prefix)
+                changed += 1
 
         if changed > 0:
-            self._dirty = True
+            self._mark_dirty()
             self._schedule_spellcheck()
             self.text.see("insert")
 
@@ -2201,10 +2846,11 @@ class NoteOverlayApp:
 
     def toggle_bullets(self):
         start_line, end_line = self._selected_line_range()
-        for line_no in range(start_line, end_line + 1):
-            self._toggle_bullet_line(line_no)
+        with self._bulk_edit():
+            for line_no in range(start_line, end_line + 1):
+                self._toggle_bullet_line(line_no)
 
-        self._dirty = True
+        self._mark_dirty()
         self.text.see("insert")
         self._set_status(
             "Bullet oppdatert. Shortcut: Ctrl+Shift+B. Nivå: Tab / Shift+Tab."
@@ -2236,6 +2882,7 @@ class NoteOverlayApp:
             self.root.after_cancel(self._spellcheck_after_id)
             self._spellcheck_after_id = None
         self.text.tag_remove(SPELLCHECK_TAG, "1.0", "end")
+        self._last_spellcheck_lines = None
         self._set_status("Stavekontroll AV.")
 
     def _word_looks_correct(self, word):
@@ -2290,7 +2937,7 @@ class NoteOverlayApp:
         if "-" not in word:
             return False
 
-        parts = [part for part in re.split(r"[-\u2010-\u2015]", word) if part]
+        parts = [part for part in HYPHEN_SPLIT_PATTERN.split(word) if part]
         if len(parts) < 2:
             return False
 
@@ -2311,6 +2958,9 @@ class NoteOverlayApp:
         return strong_parts >= 1
 
     def _best_zipf_score(self, lowered_word):
+        if lowered_word in self._zipf_cache:
+            return self._zipf_cache[lowered_word]
+
         best_score = None
         for lang in SPELLCHECK_LANGS:
             try:
@@ -2319,6 +2969,10 @@ class NoteOverlayApp:
                 continue
             if best_score is None or score > best_score:
                 best_score = score
+
+        if len(self._zipf_cache) >= SPELLCHECK_CACHE_MAX_WORDS:
+            self._zipf_cache.clear()
+        self._zipf_cache[lowered_word] = best_score
         return best_score
 
     def _compound_segment_score(self, segment, side):
@@ -2345,15 +2999,34 @@ class NoteOverlayApp:
                 best = score
         return best
 
+    def _compound_root_words(self):
+        if self._compound_roots is None:
+            roots = set()
+            if top_n_list is not None:
+                for lang in SPELLCHECK_LANGS:
+                    try:
+                        roots.update(top_n_list(lang, SPELLCHECK_COMPOUND_ROOT_COUNT))
+                    except Exception:
+                        continue
+            self._compound_roots = frozenset(roots)
+        return self._compound_roots
+
     def _looks_like_compound_word(self, lowered_word):
         if len(lowered_word) < 8 or not lowered_word.isalpha():
             return False
 
         # Norwegian compound words are often missing as full-form entries in wordfreq.
         # Accept if the word can be split into two reasonably common chunks.
+        roots = self._compound_root_words()
         for split_at in range(3, len(lowered_word) - 2):
             left = lowered_word[:split_at]
             right = lowered_word[split_at:]
+
+            # Halvdeler blant de vanligste ordene ligger godt over
+            # terskelen; godta uten frekvensoppslag.
+            if left in roots and right in roots:
+                return True
+
             left_score = self._compound_segment_score(left, "left")
             right_score = self._compound_segment_score(right, "right")
 
@@ -2385,7 +3058,18 @@ class NoteOverlayApp:
             return 1.6
         return 1.45
 
-    def _schedule_spellcheck(self):
+    def _schedule_spellcheck(self, force_full=False):
+        if force_full:
+            # Dommene er endret uten at teksten er det (f.eks. nytt ord i
+            # ordboken); diff-vinduet må dekke hele dokumentet.
+            self._last_spellcheck_lines = None
+        elif (
+            self._spellcheck_after_id is not None
+            and self._spellcheck_pending_version == self._text_version
+        ):
+            # Allerede planlagt for samme redigeringstilstand; behold timeren.
+            return
+
         if self._spellcheck_after_id is not None:
             self.root.after_cancel(self._spellcheck_after_id)
             self._spellcheck_after_id = None
@@ -2393,33 +3077,124 @@ class NoteOverlayApp:
         if not self.spellcheck_enabled or not self._spellcheck_available:
             return
 
+        # Any pending in-flight scan result is stale once the text changes.
+        self._spellcheck_generation += 1
+        self._spellcheck_pending_version = self._text_version
         self._spellcheck_after_id = self.root.after(
             SPELLCHECK_DEBOUNCE_MS, self._run_spellcheck
         )
 
+    def _changed_line_window(self, previous_lines, current_lines):
+        if previous_lines is None:
+            return 1, len(current_lines)
+
+        prefix = 0
+        max_prefix = min(len(previous_lines), len(current_lines))
+        while prefix < max_prefix and previous_lines[prefix] == current_lines[prefix]:
+            prefix += 1
+
+        if prefix == len(previous_lines) == len(current_lines):
+            return None, None
+
+        suffix = 0
+        max_suffix = min(len(previous_lines), len(current_lines)) - prefix
+        while (
+            suffix < max_suffix
+            and previous_lines[-1 - suffix] == current_lines[-1 - suffix]
+        ):
+            suffix += 1
+
+        return prefix + 1, len(current_lines) - suffix
+
     def _run_spellcheck(self):
         self._spellcheck_after_id = None
-        self.text.tag_remove(SPELLCHECK_TAG, "1.0", "end")
 
         if not self.spellcheck_enabled or not self._spellcheck_available:
             return
 
-        line_count = int(self.text.index("end-1c").split(".")[0])
-        for line_no in range(1, line_count + 1):
-            line_start = f"{line_no}.0"
-            line_end = f"{line_no}.end"
-            line_text = self.text.get(line_start, line_end)
+        current_lines = self._get_full_text().split("\n")
+        first_line, last_line = self._changed_line_window(
+            self._last_spellcheck_lines, current_lines
+        )
+        if first_line is None:
+            return
 
-            for match in SPELLCHECK_WORD_PATTERN.finditer(line_text):
-                start = f"{line_no}.{match.start()}"
-                end = f"{line_no}.{match.end()}"
-                if IMAGE_TOKEN_HIDDEN_TAG in self.text.tag_names(start):
-                    continue
-                if SUPERSCRIPT_TAG in self.text.tag_names(start):
-                    continue
-                if self._word_looks_correct(match.group(0)):
-                    continue
-                self.text.tag_add(SPELLCHECK_TAG, start, end)
+        generation = self._spellcheck_generation
+        self._spellcheck_executor.submit(
+            self._spellcheck_worker, generation, current_lines, first_line, last_line
+        )
+
+    def _spellcheck_worker(self, generation, lines, first_line, last_line):
+        # Pure zipf/heuristic work; no Tk calls are allowed in this thread.
+        ranges = []
+        find_words = SPELLCHECK_WORD_PATTERN.finditer
+        verdict_cache = self._word_verdict_cache
+        looks_correct = self._word_looks_correct
+        for line_no in range(first_line, last_line + 1):
+            line_text = lines[line_no - 1]
+            for match in find_words(line_text):
+                word = match.group(0)
+                verdict = verdict_cache.get(word)
+                if verdict is None:
+                    verdict = looks_correct(word)
+                    if len(verdict_cache) >= SPELLCHECK_CACHE_MAX_WORDS:
+                        verdict_cache.clear()
+                    verdict_cache[word] = verdict
+                if not verdict:
+                    ranges.append((line_no, match.start(), match.end()))
+
+        self.root.after(
+            0,
+            self._apply_spellcheck_ranges,
+            generation,
+            lines,
+            first_line,
+            last_line,
+            ranges,
+        )
+
+    def _apply_spellcheck_ranges(self, generation, lines, first_line, last_line, ranges):
+        if not self.spellcheck_enabled or not self._spellcheck_available:
+            return
+        if generation != self._spellcheck_generation:
+            # The text changed while the worker ran; the next scheduled scan
+            # diffs against the old baseline and re-covers these lines.
+            return
+
+        self._last_spellcheck_lines = lines
+        self.text.tag_remove(SPELLCHECK_TAG, f"{first_line}.0", f"{last_line}.end")
+
+        # Hidden-token and superscript regions are fetched once as offset
+        # spans; checking each flagged word is then a bisect instead of a
+        # tag_names round-trip.
+        self._get_full_text()
+        line_starts = self._text_cache_line_starts
+        merged = sorted(
+            self._tag_spans_as_offsets(IMAGE_TOKEN_HIDDEN_TAG, line_starts)
+            + self._tag_spans_as_offsets(SUPERSCRIPT_TAG, line_starts)
+        )
+        skip_spans = []
+        for span_start, span_end in merged:
+            if skip_spans and span_start <= skip_spans[-1][1]:
+                if span_end > skip_spans[-1][1]:
+                    skip_spans[-1] = (skip_spans[-1][0], span_end)
+            else:
+                skip_spans.append((span_start, span_end))
+
+        def covered(offset):
+            i = bisect_right(skip_spans, (offset, float("inf"))) - 1
+            return i >= 0 and skip_spans[i][1] > offset
+
+        index_pairs = []
+        for line_no, start_col, end_col in ranges:
+            if skip_spans and covered(line_starts[line_no - 1] + start_col):
+                continue
+            index_pairs.append(f"{line_no}.{start_col}")
+            index_pairs.append(f"{line_no}.{end_col}")
+        if index_pairs:
+            # One variadic tag_add crosses the Python->Tcl bridge once for
+            # all ranges instead of once per word.
+            self.text.tag_add(SPELLCHECK_TAG, *index_pairs)
 
     def _set_status(self, message):
         self.status_var.set(message)
@@ -2461,12 +3236,15 @@ class NoteOverlayApp:
         if standard_name:
             return standard_name
 
-        user32 = self._u32
-        buffer = ctypes.create_unicode_buffer(256)
-        count = user32.GetClipboardFormatNameW(format_id, buffer, 256)
-        if count > 0:
-            return buffer.value
-        return f"FORMAT_{format_id}"
+        cached = self._clip_name_cache.get(format_id)
+        if cached is not None:
+            return cached
+
+        buffer = self._clip_name_buf
+        count = self._u32.GetClipboardFormatNameW(format_id, buffer, 256)
+        name = buffer.value if count > 0 else f"FORMAT_{format_id}"
+        self._clip_name_cache[format_id] = name
+        return name
 
     def _clipboard_available_format_names(self):
         user32 = self._u32
@@ -2487,17 +3265,9 @@ class NoteOverlayApp:
         return names
 
 
-    def _read_clipboard_format_bytes(self, format_names, keyword=None):
+    def _read_clipboard_format_bytes(self, format_ids, keyword=None):
         user32 = self._u32
         kernel32 = self._k32
-        if isinstance(format_names, str):
-            format_names = [format_names]
-
-        format_ids = []
-        for format_name in format_names:
-            format_id = user32.RegisterClipboardFormatW(format_name)
-            if format_id:
-                format_ids.append(format_id)
 
         if not format_ids and not keyword:
             return None
@@ -2558,50 +3328,51 @@ class NoteOverlayApp:
 
         data = raw_data
 
-        def looks_like_utf16le(blob):
-            sample = blob[: min(len(blob), 1024)]
-            if len(sample) < 8:
-                return False
-            even = sample[0::2]
-            odd = sample[1::2]
-            if not even or not odd:
-                return False
-            even_zero = even.count(0) / len(even)
-            odd_zero = odd.count(0) / len(odd)
-            return odd_zero > 0.55 and even_zero < 0.25
-
-        def looks_like_utf16be(blob):
-            sample = blob[: min(len(blob), 1024)]
-            if len(sample) < 8:
-                return False
-            even = sample[0::2]
-            odd = sample[1::2]
-            if not even or not odd:
-                return False
-            even_zero = even.count(0) / len(even)
-            odd_zero = odd.count(0) / len(odd)
-            return even_zero > 0.55 and odd_zero < 0.25
-
-        looks_le = looks_like_utf16le(data)
-        looks_be = looks_like_utf16be(data)
-        starts_with_bom = data.startswith(b"\xff\xfe") or data.startswith(b"\xfe\xff")
-
-        # Trim padding nulls often present in HGLOBAL buffers.
-        if not (starts_with_bom or looks_le or looks_be):
-            data = re.sub(rb"\x00+$", b"", data)
+        # En BOM gir fasiten direkte; da trengs verken null-sampling eller
+        # prøving av feil kodeker først.
+        if data.startswith(b"\xef\xbb\xbf"):
+            try:
+                return data[3:].decode("utf-8").replace("\x00", "")
+            except Exception:
+                pass
 
-        if starts_with_bom:
+        if data.startswith((b"\xff\xfe", b"\xfe\xff")):
             encodings = ("utf-16", "utf-8", "cp1252", "latin1")
-        elif looks_le:
-            if len(data) % 2 == 1:
-                data = data[:-1]
-            encodings = ("utf-16le", "utf-16", "utf-8", "cp1252", "latin1")
-        elif looks_be:
-            if len(data) % 2 == 1:
-                data = data[:-1]
-            encodings = ("utf-16be", "utf-16", "utf-8", "cp1252", "latin1")
         else:
-            encodings = ("utf-8", "cp1252", "latin1", "utf-16le")
+
+            def utf16_zero_ratios(blob):
+                # Én gjennomgang av sample holder for begge byteordener.
+                sample = blob[: min(len(blob), 1024)]
+                if len(sample) < 8:
+                    return None
+                even = sample[0::2]
+                odd = sample[1::2]
+                if not even or not odd:
+                    return None
+                return even.count(0) / len(even), odd.count(0) / len(odd)
+
+            ratios = utf16_zero_ratios(data)
+            if ratios is None:
+                looks_le = looks_be = False
+            else:
+                even_zero, odd_zero = ratios
+                looks_le = odd_zero > 0.55 and even_zero < 0.25
+                looks_be = even_zero > 0.55 and odd_zero < 0.25
+
+            # Trim padding nulls often present in HGLOBAL buffers.
+            if not (looks_le or looks_be):
+                data = TRAILING_NULLS_PATTERN.sub(b"", data)
+
+            if looks_le:
+                if len(data) % 2 == 1:
+                    data = data[:-1]
+                encodings = ("utf-16le", "utf-16", "utf-8", "cp1252", "latin1")
+            elif looks_be:
+                if len(data) % 2 == 1:
+                    data = data[:-1]
+                encodings = ("utf-16be", "utf-16", "utf-8", "cp1252", "latin1")
+            else:
+                encodings = ("utf-8", "cp1252", "latin1", "utf-16le")
 
         for encoding in encodings:
             try:
@@ -2620,57 +3391,61 @@ class NoteOverlayApp:
         if not html_text:
             return ""
 
-        marker_match = re.search(
-            r"<!--\s*StartFragment\s*-->(.*?)<!--\s*EndFragment\s*-->",
-            html_text,
-            flags=re.IGNORECASE | re.DOTALL,
-        )
+        marker_match = HTML_FRAGMENT_MARKER_PATTERN.search(html_text)
         if marker_match:
             return marker_match.group(1)
 
-        offset_match = re.search(
-            r"StartFragment:(\d+).*?EndFragment:(\d+)",
-            html_text,
-            flags=re.IGNORECASE | re.DOTALL,
-        )
+        offset_match = HTML_FRAGMENT_OFFSET_PATTERN.search(html_text)
         if offset_match:
             start = int(offset_match.group(1))
             end = int(offset_match.group(2))
             if 0 <= start < end <= len(html_text):
                 return html_text[start:end]
 
-        body_match = re.search(
-            r"<body[^>]*>(.*?)</body>", html_text, flags=re.IGNORECASE | re.DOTALL
-        )
+        body_match = HTML_BODY_PATTERN.search(html_text)
         if body_match:
             return body_match.group(1)
 
         return html_text
 
-    def _read_clipboard_html_fragment(self):
-        raw_data = self._read_clipboard_format_bytes(
-            CLIPBOARD_HTML_FORMAT_NAMES, keyword="html"
-        )
+    def _cf_header_int(self, header, key):
+        i = header.find(key)
+        if i < 0:
+            return None
+        i += len(key)
+        j = i
+        while j < len(header) and 0x30 <= header[j] <= 0x39:
+            j += 1
+        if j == i:
+            return None
+        return int(header[i:j])
+
+    def _parse_clipboard_html_payload(self, raw_data):
         if not raw_data:
             return None
 
-        compact = re.sub(rb"\x00+$", b"", raw_data)
+        compact = TRAILING_NULLS_PATTERN.sub(b"", raw_data)
         html_bytes = compact
         fragment_bytes = compact
 
-        start_html_match = re.search(rb"StartHTML:(\d+)", compact)
-        end_html_match = re.search(rb"EndHTML:(\d+)", compact)
-        if start_html_match and end_html_match:
-            html_start = int(start_html_match.group(1))
-            html_end = int(end_html_match.group(1))
+        # CF_HTML-headerne ligger alltid i starten av payloaden; fire
+        # bytes.find i et lite utsnitt slår regex-skanning av hele bufferet.
+        # Payloads uten Version:-signaturen er ikke CF_HTML og går rett til
+        # markør-fallbacken.
+        header = compact[:2048]
+        if header.startswith(b"Version:"):
+            html_start = self._cf_header_int(header, b"StartHTML:")
+            html_end = self._cf_header_int(header, b"EndHTML:")
+            start = self._cf_header_int(header, b"StartFragment:")
+            end = self._cf_header_int(header, b"EndFragment:")
+        else:
+            html_start = html_end = start = end = None
+
+        if html_start is not None and html_end is not None:
             if 0 <= html_start < html_end <= len(compact):
                 html_bytes = compact[html_start:html_end]
 
-        start_match = re.search(rb"StartFragment:(\d+)", compact)
-        end_match = re.search(rb"EndFragment:(\d+)", compact)
-        if start_match and end_match:
-            start = int(start_match.group(1))
-            end = int(end_match.group(1))
+        if start is not None and end is not None:
             if 0 <= start < end <= len(compact):
                 fragment_bytes = compact[start:end]
             else:
@@ -2715,36 +3490,28 @@ class NoteOverlayApp:
         if not html_text:
             return {"class_bold_map": class_bold_map, "css_vars": css_vars}
 
-        style_blocks = re.findall(
-            r"<style[^>]*>(.*?)</style>", html_text, flags=re.IGNORECASE | re.DOTALL
-        )
+        # Vanlige nettleser-kopier har ingen <style>-blokk; en billig
+        # substrengtest sparer regex-skanningen av hele payloaden.
+        if "<style" not in html_text and "<STYLE" not in html_text:
+            return {"class_bold_map": class_bold_map, "css_vars": css_vars}
 
-        for block in style_blocks:
-            for _selector_text, declarations in re.findall(
-                r"([^{}]+)\{([^{}]+)\}", block, flags=re.DOTALL
-            ):
-                for var_name, var_value in re.findall(
-                    r"(--[A-Za-z0-9_-]+)\s*:\s*([^;]+)",
-                    declarations,
-                    flags=re.IGNORECASE,
-                ):
-                    css_vars[var_name.casefold()] = var_value.strip()
-
-        for block in style_blocks:
-            for selector_text, declarations in re.findall(
-                r"([^{}]+)\{([^{}]+)\}", block, flags=re.DOTALL
-            ):
+        # Ett pass per regel: variabler samles opp mens reglene leses, og
+        # fet-deteksjonen ser variablene som er deklarert så langt. Word og
+        # Docs legger :root-variablene først, så i praksis er kartet
+        # komplett før noen regel refererer dem.
+        for block in STYLE_BLOCK_PATTERN.findall(html_text):
+            for rule in CSS_RULE_PATTERN.finditer(block):
+                selector_text, declarations = rule.groups()
+                for var_match in CSS_VAR_DECL_PATTERN.finditer(declarations):
+                    css_vars[var_match.group(1).casefold()] = var_match.group(2).strip()
                 if not ClipboardHtmlRunParser._style_implies_bold(declarations, css_vars):
                     continue
-                for class_name in re.findall(r"\.([A-Za-z0-9_-]+)", selector_text):
+                for class_name in CSS_CLASS_NAME_PATTERN.findall(selector_text):
                     class_bold_map[class_name] = True
 
         return {"class_bold_map": class_bold_map, "css_vars": css_vars}
 
-    def _read_clipboard_rtf_runs(self):
-        raw_data = self._read_clipboard_format_bytes(
-            CLIPBOARD_RTF_FORMAT_NAMES, keyword="rtf"
-        )
+    def _parse_clipboard_rtf_runs(self, raw_data):
         if not raw_data:
             return []
 
@@ -2756,34 +3523,38 @@ class NoteOverlayApp:
         if rtf_start > 0:
             rtf_text = rtf_text[rtf_start:]
 
-        parser = ClipboardRtfRunParser()
         try:
-            runs = parser.parse(rtf_text)
+            runs = _parse_rtf_runs_cached(rtf_text)
         except Exception:
             return []
 
         return self._normalize_captured_runs(runs)
 
     def _normalize_captured_runs(self, runs):
-        normalized = []
+        # Nabobiter samles i lister og limes én gang til slutt; += på en
+        # streng inne i en liste kan degenerere til O(N^2) for mange runs.
+        merged = []
         for run_text, is_bold in runs:
             cleaned = self._normalize_captured_text(run_text)
             cleaned = cleaned.replace("\u2022", "-")
-            cleaned = re.sub(r"\n[ \t]*-\s*\n", "\n- ", cleaned)
-            cleaned = re.sub(r"\n{3,}", "\n\n", cleaned)
+            cleaned = DASH_LINE_PATTERN.sub("\n- ", cleaned)
+            cleaned = MANY_NEWLINES_PATTERN.sub("\n\n", cleaned)
             cleaned = cleaned.replace("\n\n- ", "\n- ")
             cleaned = cleaned.replace("\n-  ", "\n- ")
             if not cleaned:
                 continue
 
-            if normalized and normalized[-1][1] == is_bold:
-                normalized[-1][0] += cleaned
+            is_bold = bool(is_bold)
+            if merged and merged[-1][1] == is_bold:
+                merged[-1][0].append(cleaned)
             else:
-                normalized.append([cleaned, bool(is_bold)])
+                merged.append([[cleaned], is_bold])
 
-        if not normalized:
+        if not merged:
             return []
 
+        normalized = [["".join(chunks), is_bold] for chunks, is_bold in merged]
+
         for i in range(1, len(normalized)):
             prev = normalized[i - 1][0]
             curr = normalized[i][0]
@@ -2804,21 +3575,53 @@ class NoteOverlayApp:
             return ""
         canonical = self._normalize_captured_text(text)
         canonical = canonical.replace("\u2022", "-")
-        canonical = re.sub(r"\n[ \t]*-\s*", "\n", canonical)
-        canonical = re.sub(r"\s+", " ", canonical)
+        canonical = CANONICAL_DASH_PATTERN.sub("\n", canonical)
+        canonical = WHITESPACE_RUN_PATTERN.sub(" ", canonical)
         return canonical.strip().casefold()
 
-    def _capture_similarity(self, text_a, text_b):
+    def _capture_similarity(self, text_a, text_b, matcher=None):
         if not text_a or not text_b:
             return 0.0
-        return SequenceMatcher(None, text_a, text_b).ratio()
+
+        # ratio() er O(N*M); de to quick-variantene er lineære øvre grenser.
+        # Ligger grensen under terskelen er kandidaten uansett forkastet,
+        # så den dyre beregningen trengs bare for reelle kandidater.
+        if matcher is None:
+            matcher = SequenceMatcher(None, "", text_b)
+        matcher.set_seq1(text_a)
+        upper_bound = matcher.real_quick_ratio()
+        if upper_bound < CAPTURE_SIMILARITY_THRESHOLD:
+            return upper_bound
+        upper_bound = matcher.quick_ratio()
+        if upper_bound < CAPTURE_SIMILARITY_THRESHOLD:
+            return upper_bound
+        return matcher.ratio()
 
     def _read_clipboard_capture(self):
         plain_text = self._read_clipboard_text()
+        raw_html = self._read_clipboard_format_bytes(
+            self._html_format_ids, keyword="html"
+        )
+        raw_rtf = self._read_clipboard_format_bytes(
+            self._rtf_format_ids, keyword="rtf"
+        )
+
+        # Uendret clipboard er normaltilfellet for polleren; samme råbytes
+        # gir samme capture uten ny dekoding/parsing/likhetsskåring.
+        key = (plain_text, raw_html, raw_rtf)
+        cached = self._capture_cache
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        capture = self._build_clipboard_capture(plain_text, raw_html, raw_rtf)
+        self._capture_cache = (key, capture)
+        return capture
+
+    def _build_clipboard_capture(self, plain_text, raw_html, raw_rtf):
         canonical_plain_text = self._canonical_capture_text(plain_text)
 
         html_capture = None
-        html_payload = self._read_clipboard_html_fragment()
+        html_payload = self._parse_clipboard_html_payload(raw_html)
         if html_payload:
             class_bold_map = html_payload.get("class_bold_map", {})
             css_vars = html_payload.get("css_vars", {})
@@ -2840,25 +3643,42 @@ class NoteOverlayApp:
             best_score = (-1, -1.0, -10**9, -1)
             best_similarity = 0.0
 
+            class_bold_items = tuple(sorted(class_bold_map.items()))
+            css_var_items = tuple(sorted(css_vars.items()))
+            seen_runs = set()
+            canonical_cache = {}
+            # seq2-indeksen (b2j) bygges én gang og gjenbrukes for alle
+            # kandidatene; set_seq1 rører den ikke.
+            plain_matcher = SequenceMatcher(None, "", canonical_plain_text)
             for candidate in fragment_candidates:
-                parser = ClipboardHtmlRunParser(class_bold_map, css_vars)
                 try:
-                    parser.feed(candidate)
-                    parser.close()
+                    candidate_runs = _parse_html_runs_cached(
+                        candidate, class_bold_items, css_var_items
+                    )
                 except Exception:
                     continue
 
-                runs = self._normalize_captured_runs(parser.runs)
+                runs = self._normalize_captured_runs(candidate_runs)
                 if not runs:
                     continue
 
+                # Fragment og html_text koker ofte ned til identiske runs;
+                # da er hele skåringen en reprise.
+                runs_key = tuple(runs)
+                if runs_key in seen_runs:
+                    continue
+                seen_runs.add(runs_key)
+
                 candidate_text = "".join(text for text, _ in runs)
                 if not candidate_text:
                     continue
 
-                candidate_canonical = self._canonical_capture_text(candidate_text)
+                candidate_canonical = canonical_cache.get(candidate_text)
+                if candidate_canonical is None:
+                    candidate_canonical = self._canonical_capture_text(candidate_text)
+                    canonical_cache[candidate_text] = candidate_canonical
                 similarity = self._capture_similarity(
-                    candidate_canonical, canonical_plain_text
+                    candidate_canonical, canonical_plain_text, plain_matcher
                 )
                 bold_chars = sum(len(text) for text, is_bold in runs if is_bold)
                 length_delta = abs(len(candidate_canonical) - len(canonical_plain_text))
@@ -2873,7 +3693,10 @@ class NoteOverlayApp:
                     best_similarity = similarity
                     best_runs = runs
 
-            if best_runs and (not canonical_plain_text or best_similarity >= 0.28):
+            if best_runs and (
+                not canonical_plain_text
+                or best_similarity >= CAPTURE_SIMILARITY_THRESHOLD
+            ):
                 html_capture = {
                     "text": "".join(text for text, _ in best_runs),
                     "runs": best_runs,
@@ -2882,7 +3705,7 @@ class NoteOverlayApp:
                 }
 
         rtf_capture = None
-        rtf_runs = self._read_clipboard_rtf_runs()
+        rtf_runs = self._parse_clipboard_rtf_runs(raw_rtf)
         if rtf_runs:
             rtf_text = "".join(text for text, _ in rtf_runs)
             if rtf_text:
@@ -2925,24 +3748,41 @@ class NoteOverlayApp:
         }
 
     def _normalize_captured_text(self, text):
-        normalized = text.replace("\r\n", "\n").replace("\r", "\n")
-        normalized = normalized.replace("\u00A0", " ").replace("\u202F", " ")
+        # CRLF må slås sammen før translate; resten er 1:1-tegn og tas i
+        # én C-pass i stedet for tre separate replace-kopier.
+        normalized = text.replace("\r\n", "\n").translate(CAPTURE_TRANSLATE_TABLE)
         normalized_lines = [
             MULTISPACE_PATTERN.sub(" ", line) for line in normalized.split("\n")
         ]
         return "\n".join(normalized_lines)
 
     def _insert_runs_at(self, index, runs):
-        cursor = index
+        # One insert for the whole capture and one tag_add for its bold
+        # runs; the run boundaries are tracked as line/column in Python.
+        line, col = map(int, self.text.index(index).split("."))
+        text_parts = []
+        bold_pairs = []
         for run_text, is_bold in runs:
             if not run_text:
                 continue
-            self.text.insert(cursor, run_text)
-            run_end = self.text.index(f"{cursor}+{len(run_text)}c")
+            start = f"{line}.{col}"
+            newline_count = run_text.count("\n")
+            if newline_count:
+                line += newline_count
+                col = len(run_text) - run_text.rfind("\n") - 1
+            else:
+                col += len(run_text)
             if is_bold:
-                self.text.tag_add(BOLD_TAG, cursor, run_end)
-            cursor = run_end
-        return cursor
+                bold_pairs.append(start)
+                bold_pairs.append(f"{line}.{col}")
+            text_parts.append(run_text)
+
+        if not text_parts:
+            return self.text.index(index)
+        self.text.insert(index, "".join(text_parts))
+        if bold_pairs:
+            self.text.tag_add(BOLD_TAG, *bold_pairs)
+        return f"{line}.{col}"
 
     def _append_captured_text(self, capture):
         try:
@@ -2957,34 +3797,69 @@ class NoteOverlayApp:
         end_at = self._insert_runs_at(insert_at, runs)
         self.text.mark_set("insert", end_at)
         self.text.see("insert")
-        self._dirty = True
+        self._mark_dirty()
 
     def _clipboard_watch_tick(self):
-        if self.auto_capture_enabled:
-            capture = self._read_clipboard_capture()
-            if capture and capture["signature"] != self._last_clipboard_signature:
-                self._last_clipboard_signature = capture["signature"]
-                self._append_captured_text(capture)
-                bold_runs = sum(1 for _text, is_bold in capture.get("runs", []) if is_bold)
-                source = capture.get("source", "text")
-                detail = capture.get("detail")
-                if bold_runs > 0:
+        if self.auto_capture_enabled and not self._capture_parse_busy:
+            plain_text = self._read_clipboard_text()
+            raw_html = self._read_clipboard_format_bytes(
+                self._html_format_ids, keyword="html"
+            )
+            raw_rtf = self._read_clipboard_format_bytes(
+                self._rtf_format_ids, keyword="rtf"
+            )
+
+            key = (plain_text, raw_html, raw_rtf)
+            cached = self._capture_cache
+            if cached is not None and cached[0] == key:
+                self._handle_capture_result(cached[1])
+            else:
+                self._capture_parse_busy = True
+                self._capture_executor.submit(self._capture_parse_worker, key)
+
+        self.root.after(CLIPBOARD_POLL_MS, self._clipboard_watch_tick)
+
+    def _capture_parse_worker(self, key):
+        # Ren parsing/skåring; ingen Tk-kall i denne tråden.
+        try:
+            capture = self._build_clipboard_capture(*key)
+        except Exception:
+            capture = None
+        self.root.after(0, self._finish_capture_parse, key, capture)
+
+    def _finish_capture_parse(self, key, capture):
+        self._capture_parse_busy = False
+        self._capture_cache = (key, capture)
+        self._handle_capture_result(capture)
+
+    def _handle_capture_result(self, capture):
+        if not self.auto_capture_enabled:
+            return
+        if capture and capture["signature"] != self._last_clipboard_signature:
+            self._last_clipboard_signature = capture["signature"]
+            self._append_captured_text(capture)
+            bold_runs = sum(1 for _text, is_bold in capture.get("runs", []) if is_bold)
+            source = capture.get("source", "text")
+            detail = capture.get("detail")
+            if bold_runs > 0:
+                self._set_status(
+                    f"Auto-fanget tekst fra clipboard ({source}, bold beholdt)."
+                )
+            else:
+                if detail:
                     self._set_status(
-                        f"Auto-fanget tekst fra clipboard ({source}, bold beholdt)."
+                        f"Auto-fanget tekst fra clipboard ({source}: {detail})"
                     )
                 else:
-                    if detail:
-                        self._set_status(
-                            f"Auto-fanget tekst fra clipboard ({source}: {detail})"
-                        )
-                    else:
-                        self._set_status(f"Auto-fanget tekst fra clipboard ({source}).")
-
-        self.root.after(CLIPBOARD_POLL_MS, self._clipboard_watch_tick)
+                    self._set_status(f"Auto-fanget tekst fra clipboard ({source}).")
 
     def _on_text_modified(self, _event):
+        if self._suppress_modified:
+            return
         if self.text.edit_modified():
-            self._dirty = True
+            self._mark_dirty()
+            self._invalidate_text_cache()
+            self._toc_cache = None
             self._schedule_spellcheck()
             if self.search_panel_visible and self.search_var.get():
                 self._refresh_search_matches()
@@ -3022,9 +3897,10 @@ class NoteOverlayApp:
         self.replace_var.set("")
         self.attachments = {}
         self.formula_meta = {}
+        self._attachment_sizes = {}
         self._inline_image_refs = []
         self.text.tag_remove(SPELLCHECK_TAG, "1.0", "end")
-        self._dirty = True
+        self._mark_dirty()
         self._save_session(silent=True)
         self._set_status("Nytt notat opprettet.")
 
@@ -3033,7 +3909,7 @@ class NoteOverlayApp:
         if image is None:
             return None
         self._save_image_and_insert_token(image)
-        self._dirty = True
+        self._mark_dirty()
         self._set_status("Bilde limt inn.")
         return "break"
 
@@ -3096,19 +3972,30 @@ class NoteOverlayApp:
                 color="#111111",
             )
 
-            FigureCanvasAgg(fig).draw()
-            buffer = io.BytesIO()
-            fig.savefig(
-                buffer,
-                format="png",
-                dpi=FORMULA_RENDER_DPI,
-                transparent=True,
-                bbox_inches="tight",
-                pad_inches=0.08,
+            canvas = FigureCanvasAgg(fig)
+            canvas.draw()
+            width, height = canvas.get_width_height()
+            # Read the Agg framebuffer directly instead of encoding a PNG to
+            # a BytesIO and decoding it again with PIL.
+            rendered = Image.frombuffer(
+                "RGBA", (width, height), canvas.buffer_rgba(), "raw", "RGBA", 0, 1
             )
-            buffer.seek(0)
-            with Image.open(buffer) as rendered:
-                rendered.convert("RGBA").save(target_path, format="PNG")
+
+            # Equivalent of savefig(bbox_inches="tight", pad_inches=0.08):
+            # crop to the drawn text plus a small margin.
+            bbox = rendered.getbbox()
+            if bbox is not None:
+                pad = max(1, int(FORMULA_RENDER_DPI * 0.08))
+                rendered = rendered.crop(
+                    (
+                        max(0, bbox[0] - pad),
+                        max(0, bbox[1] - pad),
+                        min(width, bbox[2] + pad),
+                        min(height, bbox[3] + pad),
+                    )
+                )
+
+            rendered.save(target_path, format="PNG", compress_level=1)
         finally:
             fig.clear()
 
@@ -3124,13 +4011,13 @@ class NoteOverlayApp:
 
         if surround_with_newlines:
             self.text.insert(insert_at, f"\n{token}\n")
-            token_start = self.text.index(f"{insert_at}+1c")
-            token_end = self.text.index(f"{token_start}+{len(token)}c")
+            token_start = self._index_after(insert_at, "\n")
+            token_end = self._index_after(token_start, token)
             next_insert = self.text.index(f"{token_end}+2c")
         else:
             self.text.insert(insert_at, token)
             token_start = insert_at
-            token_end = self.text.index(f"{token_start}+{len(token)}c")
+            token_end = self._index_after(token_start, token)
             next_insert = token_end
 
         self._render_token_as_inline_image(token_start, token_end, image_path)
@@ -3187,22 +4074,36 @@ class NoteOverlayApp:
         self._insert_attachment_token(
             image_id, str(image_path), surround_with_newlines=False
         )
-        self._dirty = True
+        self._mark_dirty()
         self._schedule_spellcheck()
         self._set_status("Formel satt inn (Ctrl+M).")
 
     def _load_inline_photo(self, image_path):
+        cache_key = (image_path, INLINE_IMAGE_MAX_WIDTH, INLINE_IMAGE_MAX_HEIGHT)
+        photo = self._inline_photo_cache.get(cache_key)
+        if photo is not None:
+            self._inline_photo_cache.move_to_end(cache_key)
+            return photo
+
         try:
             with Image.open(image_path) as img:
+                # Let JPEG decode straight to a near-target size before the
+                # proper downscale; a no-op for PNG screenshots.
+                img.draft("RGB", (INLINE_IMAGE_MAX_WIDTH, INLINE_IMAGE_MAX_HEIGHT))
+                resampling = getattr(Image, "Resampling", Image)
+                img.thumbnail(
+                    (INLINE_IMAGE_MAX_WIDTH, INLINE_IMAGE_MAX_HEIGHT),
+                    resampling.BILINEAR,
+                )
                 preview = img.convert("RGB")
         except Exception:
             return None
 
-        resampling = getattr(Image, "Resampling", Image)
-        preview.thumbnail(
-            (INLINE_IMAGE_MAX_WIDTH, INLINE_IMAGE_MAX_HEIGHT), resampling.LANCZOS
-        )
-        return ImageTk.PhotoImage(preview)
+        photo = ImageTk.PhotoImage(preview)
+        self._inline_photo_cache[cache_key] = photo
+        while len(self._inline_photo_cache) > INLINE_IMAGE_CACHE_SIZE:
+            self._inline_photo_cache.popitem(last=False)
+        return photo
 
     def _render_token_as_inline_image(self, token_start, token_end, image_path):
         if IMAGE_TOKEN_HIDDEN_TAG in self.text.tag_names(token_start):
@@ -3215,38 +4116,60 @@ class NoteOverlayApp:
         self.text.tag_add(IMAGE_TOKEN_HIDDEN_TAG, token_start, token_end)
         self.text.image_create(token_end, image=photo, padx=3, pady=3)
         self._inline_image_refs.append(photo)
+        # Bildet skyver Tk-kolonnene bak seg; kolonnekartet må leses på nytt.
+        self._text_cache_image_cols = None
 
     def _render_inline_images_from_tokens(self):
-        search_from = "1.0"
-        while True:
-            token_start = self.text.search("[[IMG:", search_from, stopindex="end")
-            if not token_start:
-                return
-
-            token_close = self.text.search("]]", token_start, stopindex="end")
-            if not token_close:
-                return
-
-            token_end = self.text.index(f"{token_close}+2c")
-            token_value = self.text.get(token_start, token_end)
-            match = IMAGE_TOKEN_PATTERN.fullmatch(token_value)
-            if match and IMAGE_TOKEN_HIDDEN_TAG not in self.text.tag_names(token_start):
-                image_id = match.group(1)
-                image_path = self.attachments.get(image_id)
-                if image_path and Path(image_path).exists():
-                    self._render_token_as_inline_image(token_start, token_end, image_path)
+        # Ett regex-søk over snapshotet i stedet for to text.search-kall per
+        # token. Forutsetter at ingen bilder er tegnet inn ennå (gjelder ved
+        # sesjonslasting); image_create skyver indekser, så tokens tas
+        # bakfra slik at de tidligere posisjonene forblir gyldige.
+        full_text = self._get_full_text()
+        line_starts = self._text_cache_line_starts
+
+        present_files = self._attachment_files_on_disk()
+        for match in reversed(list(IMAGE_TOKEN_PATTERN.finditer(full_text))):
+            image_path = self.attachments.get(match.group(1))
+            if not image_path:
+                continue
+            # exists() er kun reserveløsning for stier utenfor IMAGES_DIR.
+            if image_path not in present_files and not Path(image_path).exists():
+                continue
+            token_start = self._offset_to_tk_index(match.start(), line_starts)
+            token_end = self._offset_to_tk_index(match.end(), line_starts)
+            self._render_token_as_inline_image(token_start, token_end, image_path)
 
-            search_from = token_end
+    def _attachment_files_on_disk(self):
+        # Én readdir i stedet for ett stat-kall per bildetoken; scandir
+        # leverer filtype sammen med oppføringen.
+        try:
+            with os.scandir(IMAGES_DIR) as entries:
+                return {entry.path for entry in entries if entry.is_file()}
+        except OSError:
+            return set()
 
     def _save_image_and_insert_token(self, image):
         image_id = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
         image_path = IMAGES_DIR / f"{image_id}.png"
-        image.convert("RGB").save(image_path, format="PNG")
+        # Rask PNG-koding: skrapbilder trenger ikke maksimal komprimering.
+        to_save = image if image.mode == "RGB" else image.convert("RGB")
+        to_save.save(image_path, format="PNG", compress_level=1)
         self.attachments[image_id] = str(image_path)
         return self._insert_attachment_token(
             image_id, str(image_path), surround_with_newlines=True
         )
 
+    def _attachment_pixel_size(self, image_path):
+        size = self._attachment_sizes.get(image_path)
+        if size is None:
+            try:
+                with Image.open(image_path) as img:
+                    size = img.size
+            except Exception:
+                size = (0, 0)
+            self._attachment_sizes[image_path] = size
+        return size
+
     def _serialize_tag_ranges(self, tag_name):
         ranges = self.text.tag_ranges(tag_name)
         serialized = []
@@ -3263,26 +4186,42 @@ class NoteOverlayApp:
             except tk.TclError:
                 continue
 
+    def _mark_dirty(self):
+        # Teller hver endring slik at eksport-cachen kan nøkles på den;
+        # _dirty alene nullstilles av autosave uten at innholdet er likt.
+        self._dirty = True
+        self._dirty_seq += 1
+
     def _build_session_payload(self):
         return {
-            "text": self.text.get("1.0", "end-1c"),
+            "text": self._get_full_text(),
             "attachments": self.attachments,
             "formula_meta": self.formula_meta,
             "bold_ranges": self._serialize_tag_ranges(BOLD_TAG),
             "superscript_ranges": self._serialize_tag_ranges(SUPERSCRIPT_TAG),
         }
 
-    def _write_json_atomic(self, path, payload):
+    def _write_bytes_atomic(self, path, content):
         temp_path = path.with_suffix(path.suffix + ".tmp")
-        content = json.dumps(payload, ensure_ascii=False, indent=2)
-        temp_path.write_text(content, encoding="utf-8")
+        temp_path.write_bytes(content)
         temp_path.replace(path)
 
+    def _serialize_session_payload(self, payload):
+        # orjson leverer UTF-8-bytes direkte; stdlib-varianten må innom en
+        # str og en ekstra kodingspass.
+        if orjson is not None:
+            return orjson.dumps(payload, option=orjson.OPT_INDENT_2)
+        return json.dumps(payload, ensure_ascii=False, indent=2).encode("utf-8")
+
+    def _write_json_atomic(self, path, payload):
+        self._write_bytes_atomic(path, self._serialize_session_payload(payload))
+
     def _read_json_payload(self, path):
         if not path.exists():
             return None
         try:
-            payload = json.loads(path.read_text(encoding="utf-8"))
+            raw = path.read_bytes()
+            payload = orjson.loads(raw) if orjson is not None else json.loads(raw)
         except Exception:
             return None
         return payload if isinstance(payload, dict) else None
@@ -3294,13 +4233,21 @@ class NoteOverlayApp:
         attachments = payload.get("attachments", {})
         return isinstance(attachments, dict) and bool(attachments)
 
-    def _payload_snapshot_key(self, payload):
-        return json.dumps(payload, ensure_ascii=False, sort_keys=True)
-
     def _sorted_backup_files(self):
-        return sorted(
-            BACKUP_DIR.glob("session-*.json"), key=lambda p: p.stat().st_mtime, reverse=True
-        )
+        # scandir leverer stat-info sammen med katalogoppføringen på
+        # Windows; glob + p.stat() kostet to stat-kall per backupfil.
+        try:
+            with os.scandir(BACKUP_DIR) as entries:
+                backups = [
+                    entry
+                    for entry in entries
+                    if entry.name.startswith("session-")
+                    and entry.name.endswith(".json")
+                ]
+        except OSError:
+            return []
+        backups.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+        return [Path(entry.path) for entry in backups]
 
     def _prune_backup_files(self):
         backups = self._sorted_backup_files()
@@ -3310,32 +4257,34 @@ class NoteOverlayApp:
             except Exception:
                 continue
 
-    def _write_backup_snapshot(self, payload):
+    def _write_backup_snapshot(self, serialized):
         stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
         target = BACKUP_DIR / f"session-{stamp}.json"
         counter = 1
         while target.exists():
             target = BACKUP_DIR / f"session-{stamp}-{counter}.json"
             counter += 1
-        self._write_json_atomic(target, payload)
+        self._write_bytes_atomic(target, serialized)
         self._prune_backup_files()
 
-    def _maybe_write_backup_snapshot(self, payload, force=False):
+    def _maybe_write_backup_snapshot(self, payload, serialized, force=False):
         if not self._payload_has_content(payload):
             return
 
-        snapshot_key = self._payload_snapshot_key(payload)
+        # Autosave har allerede serialisert payloaden; samme bytes brukes
+        # både som endringsnøkkel og som backupinnhold, i stedet for to
+        # ekstra json.dumps-pass per intervall.
         now = datetime.now()
         due_by_time = (
             self._last_backup_snapshot_at is None
             or (now - self._last_backup_snapshot_at).total_seconds() * 1000
             >= AUTOSAVE_BACKUP_MS
         )
-        changed = snapshot_key != self._last_backup_snapshot_key
+        changed = serialized != self._last_backup_snapshot_key
         if force or (due_by_time and changed):
-            self._write_backup_snapshot(payload)
+            self._write_backup_snapshot(serialized)
             self._last_backup_snapshot_at = now
-            self._last_backup_snapshot_key = snapshot_key
+            self._last_backup_snapshot_key = serialized
 
     def _apply_session_payload(self, payload):
         text_value = payload.get("text", "")
@@ -3354,9 +4303,13 @@ class NoteOverlayApp:
         self._clear_search_highlights()
         self._inline_image_refs = []
         self.text.insert("1.0", text_value)
+        # <<Modified>> leveres først via eventløkka; les aldri et utdatert
+        # snapshot under resten av innlastingen.
+        self._invalidate_text_cache()
         self.attachments = {
             key: value for key, value in attachment_map.items() if Path(value).exists()
         }
+        self._attachment_sizes = {}
         self.formula_meta = {}
         for image_id, raw_formula in formula_map.items():
             if image_id not in self.attachments:
@@ -3373,29 +4326,63 @@ class NoteOverlayApp:
         self._render_inline_images_from_tokens()
         self.text.edit_modified(False)
         self._dirty = False
+        # Innholdet er byttet ut uten å gå via _mark_dirty.
+        self._dirty_seq += 1
 
     def _save_session(self, silent, force_backup=False):
+        # Ikke skriv over session.json med en tom buffer mens innlastingen
+        # fortsatt pågår på arbeidstråden.
+        if self._session_loading:
+            return
+
         payload = self._build_session_payload()
+        serialized = self._serialize_session_payload(payload)
+
+        # Autosave fires every few seconds; when nothing changed since the
+        # last write there is no reason to touch the disk again.
+        if serialized == self._last_session_serialized and not force_backup:
+            self._dirty = False
+            if not silent:
+                self._set_status(f"Lagret: {SESSION_FILE}")
+            return
+
         try:
-            if SESSION_FILE.exists():
+            # Forrige lagring ligger allerede i minnet; les den ikke inn
+            # fra disk igjen bare for å skrive prev-filen.
+            previous = self._last_session_serialized
+            if previous is None and SESSION_FILE.exists():
                 try:
-                    SESSION_PREV_FILE.write_text(
-                        SESSION_FILE.read_text(encoding="utf-8"), encoding="utf-8"
-                    )
+                    previous = SESSION_FILE.read_bytes()
+                except Exception:
+                    previous = None
+            if previous is not None:
+                try:
+                    SESSION_PREV_FILE.write_bytes(previous)
                 except Exception:
                     pass
 
-            self._write_json_atomic(SESSION_FILE, payload)
-            self._maybe_write_backup_snapshot(payload, force=force_backup)
+            self._write_bytes_atomic(SESSION_FILE, serialized)
+            self._maybe_write_backup_snapshot(payload, serialized, force=force_backup)
         except Exception as exc:
             self._set_status(f"Lagring feilet: {exc}")
             return
 
+        self._last_session_serialized = serialized
         self._dirty = False
         if not silent:
             self._set_status(f"Lagret: {SESSION_FILE}")
 
     def _load_session(self):
+        # Lesing og JSON-parsing skjer på arbeidstråden slik at vinduet
+        # tegnes med en gang; resultatet legges inn via after.
+        self._session_loading = True
+        future = self._export_executor.submit(self._read_session_from_disk)
+        future.add_done_callback(
+            lambda f: self.root.after(0, self._finish_session_load, f)
+        )
+
+    def _read_session_from_disk(self):
+        # Kun disk-I/O; ingen Tk-kall i denne tråden.
         payload = self._read_json_payload(SESSION_FILE)
         payload_source = "session"
 
@@ -3411,28 +4398,39 @@ class NoteOverlayApp:
                     break
 
         if payload is None:
-            return
+            return None, None, None
 
-        main_payload = self._read_json_payload(SESSION_FILE)
-        if (
-            main_payload is not None
-            and not self._payload_has_content(main_payload)
-            and payload_source == "session"
-        ):
+        backup_candidate = None
+        if payload_source == "session" and not self._payload_has_content(payload):
             for backup_file in self._sorted_backup_files():
                 backup_payload = self._read_json_payload(backup_file)
                 if backup_payload and self._payload_has_content(backup_payload):
-                    if messagebox.askyesno(
-                        "Gjenopprett autosave",
-                        (
-                            "Fant en autosave-kopi med innhold.\n"
-                            f"Vil du laste den i stedet?\n\n{backup_file.name}"
-                        ),
-                    ):
-                        payload = backup_payload
-                        payload_source = backup_file.name
+                    backup_candidate = (backup_file.name, backup_payload)
                     break
 
+        return payload, payload_source, backup_candidate
+
+    def _finish_session_load(self, future):
+        self._session_loading = False
+        try:
+            payload, payload_source, backup_candidate = future.result()
+        except Exception:
+            return
+        if payload is None:
+            return
+
+        if backup_candidate is not None:
+            backup_name, backup_payload = backup_candidate
+            if messagebox.askyesno(
+                "Gjenopprett autosave",
+                (
+                    "Fant en autosave-kopi med innhold.\n"
+                    f"Vil du laste den i stedet?\n\n{backup_name}"
+                ),
+            ):
+                payload = backup_payload
+                payload_source = backup_name
+
         self._apply_session_payload(payload)
 
         if self._payload_has_content(payload):
@@ -3447,129 +4445,181 @@ class NoteOverlayApp:
 
         self._schedule_spellcheck()
 
-    def _split_text_runs_by_format(self, segment_start, segment_text):
-        if not segment_text:
-            return []
-
-        runs = []
-        current_style = None
-        buffer = []
-
-        for offset, ch in enumerate(segment_text):
-            char_index = self.text.index(f"{segment_start}+{offset}c")
-            is_bold = BOLD_TAG in self.text.tag_names(char_index)
-            is_superscript = SUPERSCRIPT_TAG in self.text.tag_names(char_index)
-            style = (is_bold, is_superscript)
-            if current_style is None:
-                current_style = style
-
-            if style != current_style:
-                runs.append(("".join(buffer), current_style[0], current_style[1]))
-                buffer = []
-                current_style = style
-
-            buffer.append(ch)
-
-        if buffer:
-            runs.append(("".join(buffer), current_style[0], current_style[1]))
-
-        return runs
-
-    def _runs_to_paragraphs(self, runs):
-        paragraphs = [[]]
-        for run_text, is_bold, is_superscript in runs:
-            parts = run_text.split("\n")
-            for i, part in enumerate(parts):
-                if part:
-                    paragraphs[-1].append((part, is_bold, is_superscript))
-                if i < len(parts) - 1:
-                    paragraphs.append([])
-
-        if not paragraphs:
-            return [[]]
-        return paragraphs
-
-    def _normalize_paragraph_runs_for_export(self, paragraph_runs):
-        if not paragraph_runs:
-            return paragraph_runs
-
-        chars = []
-        for run_text, is_bold, is_superscript in paragraph_runs:
-            for ch in run_text:
-                chars.append([ch, is_bold, is_superscript])
-
-        if not chars:
-            return paragraph_runs
-
-        plain_text = "".join(item[0] for item in chars)
-        for match in re.finditer(r"[A-Za-z\u00C0-\u024F]+", plain_text):
+    def _tag_spans_as_offsets(self, tag, line_starts):
+        spans = []
+        ranges = self.text.tag_ranges(tag)
+        for i in range(0, len(ranges), 2):
+            spans.append(
+                (
+                    self._tk_index_to_offset(str(ranges[i]), line_starts),
+                    self._tk_index_to_offset(str(ranges[i + 1]), line_starts),
+                )
+            )
+        return spans
+
+    def _segment_style_masks(self, start_offset, segment_text, bold_spans, sup_spans):
+        # Stilflaggene bygges som bytemasker for hele segmentet i ett pass;
+        # avsnitt og kjøringer skjæres rett ut av maskene etterpå.
+        length = len(segment_text)
+        end_offset = start_offset + length
+        bold_mask = bytearray(length)
+        super_mask = bytearray(length)
+        for mask, spans in ((bold_mask, bold_spans), (super_mask, sup_spans)):
+            for span_start, span_end in spans:
+                if span_start >= end_offset or span_end <= start_offset:
+                    continue
+                lo = max(span_start, start_offset) - start_offset
+                hi = min(span_end, end_offset) - start_offset
+                mask[lo:hi] = b"\x01" * (hi - lo)
+        return bold_mask, super_mask
+
+    def _normalize_bold_mask(self, plain_text, bold_mask):
+        # Ord der bare de 1-2 første bokstavene mangler bold gjøres helfete.
+        letter_run_pattern = (
+            LETTER_RUN_ASCII_PATTERN if plain_text.isascii() else LETTER_RUN_PATTERN
+        )
+        for match in letter_run_pattern.finditer(plain_text):
             start, end = match.span()
-            bold_flags = [chars[i][1] for i in range(start, end)]
-            if not any(bold_flags) or all(bold_flags):
+            word_bold = bold_mask[start:end]
+            if not any(word_bold) or all(word_bold):
                 continue
 
             prefix_nonbold = 0
-            while prefix_nonbold < len(bold_flags) and not bold_flags[prefix_nonbold]:
+            while prefix_nonbold < len(word_bold) and not word_bold[prefix_nonbold]:
                 prefix_nonbold += 1
 
-            if 0 < prefix_nonbold <= 2 and all(bold_flags[prefix_nonbold:]):
-                for i in range(start, start + prefix_nonbold):
-                    chars[i][1] = True
-
-        normalized = []
-        buffer = []
-        current_style = None
+            if 0 < prefix_nonbold <= 2 and all(word_bold[prefix_nonbold:]):
+                bold_mask[start : start + prefix_nonbold] = b"\x01" * prefix_nonbold
 
-        for ch, is_bold, is_superscript in chars:
-            style = (is_bold, is_superscript)
-            if current_style is None:
-                current_style = style
+    def _runs_from_masks(self, plain_text, bold_mask, super_mask):
+        runs = []
+        run_start = 0
+        for i in range(1, len(plain_text)):
+            if bold_mask[i] != bold_mask[run_start] or super_mask[i] != super_mask[run_start]:
+                runs.append(
+                    (
+                        plain_text[run_start:i],
+                        bool(bold_mask[run_start]),
+                        bool(super_mask[run_start]),
+                    )
+                )
+                run_start = i
+        runs.append(
+            (
+                plain_text[run_start:],
+                bool(bold_mask[run_start]),
+                bool(super_mask[run_start]),
+            )
+        )
+        return runs
 
-            if style != current_style:
-                normalized.append(("".join(buffer), current_style[0], current_style[1]))
-                buffer = [ch]
-                current_style = style
+    def _classified_paragraphs_for_segment(
+        self, start_offset, segment_text, bold_spans, sup_spans
+    ):
+        bold_mask, super_mask = self._segment_style_masks(
+            start_offset, segment_text, bold_spans, sup_spans
+        )
+        paragraphs = []
+        line_start = 0
+        length = len(segment_text)
+        while True:
+            newline = segment_text.find("\n", line_start)
+            line_end = length if newline == -1 else newline
+            plain_text = segment_text[line_start:line_end]
+            if plain_text:
+                line_bold = bold_mask[line_start:line_end]
+                line_super = super_mask[line_start:line_end]
+                has_bold = any(line_bold)
+                if not has_bold and not any(line_super):
+                    # Vanligste tilfellet: ren tekst uten formatering.
+                    runs = [(plain_text, False, False)]
+                else:
+                    if has_bold:
+                        self._normalize_bold_mask(plain_text, line_bold)
+                    runs = self._runs_from_masks(plain_text, line_bold, line_super)
             else:
-                buffer.append(ch)
-
-        if buffer:
-            normalized.append(("".join(buffer), current_style[0], current_style[1]))
+                runs = []
+            paragraphs.append(self._classify_paragraph_for_export(runs, plain_text))
+            if newline == -1:
+                break
+            line_start = newline + 1
+        return paragraphs
 
-        return normalized
+    def _export_cache_key(self):
+        return (self._dirty_seq, len(self.attachments))
 
-    def _content_blocks_for_export(self):
-        text_value = self.text.get("1.0", "end-1c")
-        blocks = []
+    def _classified_blocks_for_export(self):
+        # Word- og PDF-eksport klassifiserer de samme avsnittene; gjør
+        # Tcl-vandringen og klassifiseringen én gang per innholdsversjon.
+        # Segmentene går rett fra snapshot + tag-spenn til klassifiserte
+        # avsnitt, uten run-tupler og re-join mellom hvert trinn.
+        cache_key = self._export_cache_key()
+        if (
+            self._export_paragraphs_cache is not None
+            and self._export_paragraphs_cache[0] == cache_key
+        ):
+            return self._export_paragraphs_cache[1]
+
+        text_value = self._get_full_text()
+        line_starts = self._text_cache_line_starts
+        bold_spans = self._tag_spans_as_offsets(BOLD_TAG, line_starts)
+        sup_spans = self._tag_spans_as_offsets(SUPERSCRIPT_TAG, line_starts)
+        present_files = self._attachment_files_on_disk()
+        classified = []
         cursor = 0
 
         for match in IMAGE_TOKEN_PATTERN.finditer(text_value):
             if match.start() > cursor:
-                segment_text = text_value[cursor : match.start()]
-                segment_start = self.text.index(f"1.0+{cursor}c")
-                blocks.append(
-                    ("text_runs", self._split_text_runs_by_format(segment_start, segment_text))
+                classified.append(
+                    (
+                        "paragraphs",
+                        self._classified_paragraphs_for_segment(
+                            cursor,
+                            text_value[cursor : match.start()],
+                            bold_spans,
+                            sup_spans,
+                        ),
+                    )
                 )
 
             image_id = match.group(1)
             image_path = self.attachments.get(image_id)
-            if image_path and Path(image_path).exists():
-                blocks.append(("image", image_path))
+            if image_path and (
+                image_path in present_files or Path(image_path).exists()
+            ):
+                classified.append(("image", image_path))
             else:
-                blocks.append(("text_runs", [(f"[Mangler bilde: {image_id}]", False, False)]))
+                placeholder_text = f"[Mangler bilde: {image_id}]"
+                classified.append(
+                    (
+                        "paragraphs",
+                        [
+                            self._classify_paragraph_for_export(
+                                [(placeholder_text, False, False)], placeholder_text
+                            )
+                        ],
+                    )
+                )
 
             cursor = match.end()
 
         if cursor < len(text_value):
-            segment_text = text_value[cursor:]
-            segment_start = self.text.index(f"1.0+{cursor}c")
-            blocks.append(
-                ("text_runs", self._split_text_runs_by_format(segment_start, segment_text))
+            classified.append(
+                (
+                    "paragraphs",
+                    self._classified_paragraphs_for_segment(
+                        cursor, text_value[cursor:], bold_spans, sup_spans
+                    ),
+                )
             )
 
-        if not blocks:
-            blocks.append(("text_runs", [("", False, False)]))
+        if not classified:
+            classified.append(
+                ("paragraphs", [self._classify_paragraph_for_export([], "")])
+            )
 
-        return blocks
+        self._export_paragraphs_cache = (cache_key, classified)
+        return classified
 
     def _trim_prefix_from_runs(self, runs, prefix_len):
         remaining = max(0, int(prefix_len))
@@ -3590,29 +4640,32 @@ class NoteOverlayApp:
         if not text:
             return 0
 
-        numbered_match = re.match(r"^\s*(\d+(?:\.\d+)*)[.)]?\s+\S", plain_text)
+        numbered_match = NUMBERED_HEADING_PATTERN.match(plain_text)
         if numbered_match:
             return min(3, numbered_match.group(1).count(".") + 1)
 
         if len(text) > 110:
             return 0
 
+        # Uten fete kjøringer kan bold-andelen aldri nå terskelen.
+        if not any(is_bold for _run_text, is_bold, _is_superscript in runs):
+            return 0
+
+        # Én C-nivå telling per kjøring i stedet for et Python-kall per tegn;
+        # etter fusjonen er kjøringene allerede slått sammen per stil.
         total_letters = 0
         bold_letters = 0
         for run_text, is_bold, _is_superscript in runs:
-            for ch in run_text:
-                if not ch.isalpha():
-                    continue
-                total_letters += 1
-                if is_bold:
-                    bold_letters += 1
+            letters = sum(map(str.isalpha, run_text))
+            total_letters += letters
+            if is_bold:
+                bold_letters += letters
 
         if total_letters >= 3 and bold_letters / max(total_letters, 1) >= 0.8:
             return 1
         return 0
 
-    def _classify_paragraph_for_export(self, paragraph_runs):
-        plain_text = "".join(text for text, _is_bold, _is_superscript in paragraph_runs)
+    def _classify_paragraph_for_export(self, paragraph_runs, plain_text):
         stripped = plain_text.strip()
         if not stripped:
             return {"kind": "blank", "runs": []}
@@ -3648,12 +4701,17 @@ class NoteOverlayApp:
         if not target:
             return
 
+        blocks = self._classified_blocks_for_export()
+        self._set_status("Eksporterer Word ...")
+        self._export_executor.submit(
+            self._export_worker, "Word", target, self._build_word_document, blocks
+        )
+
+    def _build_word_document(self, target, blocks):
         doc = Document()
-        for block_type, value in self._content_blocks_for_export():
-            if block_type == "text_runs":
-                for paragraph_runs in self._runs_to_paragraphs(value):
-                    paragraph_runs = self._normalize_paragraph_runs_for_export(paragraph_runs)
-                    paragraph_info = self._classify_paragraph_for_export(paragraph_runs)
+        for block_type, value in blocks:
+            if block_type == "paragraphs":
+                for paragraph_info in value:
                     kind = paragraph_info["kind"]
                     runs = paragraph_info["runs"]
                     marker_prefix = ""
@@ -3693,8 +4751,27 @@ class NoteOverlayApp:
                     doc.add_paragraph(f"[Kunne ikke legge til bilde: {Path(value).name}]")
 
         doc.save(target)
-        self._set_status(f"Eksporterte Word: {target}")
-        messagebox.showinfo("Eksport fullført", f"Lagret Word-fil:\n{target}")
+
+    def _export_worker(self, kind, target, build, blocks):
+        # Dokumentbygging er ren python-docx/reportlab-jobb; ingen Tk-kall
+        # er tillatt i denne tråden. Resultatet meldes tilbake via after.
+        try:
+            build(target, blocks)
+        except Exception as exc:
+            error = str(exc)
+        else:
+            error = None
+        self.root.after(0, self._finish_export, kind, target, error)
+
+    def _finish_export(self, kind, target, error):
+        if error is not None:
+            self._set_status(f"Eksport feilet: {error}")
+            messagebox.showerror(
+                "Eksport feilet", f"Kunne ikke lagre {kind}-fil:\n{error}"
+            )
+            return
+        self._set_status(f"Eksporterte {kind}: {target}")
+        messagebox.showinfo("Eksport fullført", f"Lagret {kind}-fil:\n{target}")
 
     def export_pdf(self):
         default_name = f"notater-{datetime.now():%Y%m%d-%H%M}.pdf"
@@ -3707,14 +4784,19 @@ class NoteOverlayApp:
         if not target:
             return
 
-        doc = SimpleDocTemplate(
-            target,
-            pagesize=A4,
-            leftMargin=36,
-            rightMargin=36,
-            topMargin=36,
-            bottomMargin=36,
+        blocks = self._classified_blocks_for_export()
+        self._set_status("Eksporterer PDF ...")
+        self._export_executor.submit(
+            self._export_worker, "PDF", target, self._build_pdf_document, blocks
         )
+
+    def _pdf_export_styles(self):
+        # Stilene avhenger kun av linjeavstanden; klon dem én gang og
+        # gjenbruk til innstillingen endres.
+        cache_key = self.pdf_line_spacing
+        if self._pdf_style_cache is not None and self._pdf_style_cache[0] == cache_key:
+            return self._pdf_style_cache[1]
+
         styles = getSampleStyleSheet()
         normal = styles["Normal"].clone("NotesNormal")
         normal.leading = max(normal.leading, int(normal.fontSize * self.pdf_line_spacing))
@@ -3739,23 +4821,46 @@ class NoteOverlayApp:
             style.spaceBefore = 1
             style.spaceAfter = 1
             bullet_styles[level] = style
-        story = []
 
-        for block_type, value in self._content_blocks_for_export():
-            if block_type == "text_runs":
-                for paragraph_runs in self._runs_to_paragraphs(value):
-                    paragraph_runs = self._normalize_paragraph_runs_for_export(paragraph_runs)
-                    paragraph_info = self._classify_paragraph_for_export(paragraph_runs)
+        built = (normal, heading_styles, bullet_styles)
+        self._pdf_style_cache = (cache_key, built)
+        return built
+
+    def _build_pdf_document(self, target, blocks):
+        doc = SimpleDocTemplate(
+            target,
+            pagesize=A4,
+            leftMargin=36,
+            rightMargin=36,
+            topMargin=36,
+            bottomMargin=36,
+        )
+        normal, heading_styles, bullet_styles = self._pdf_export_styles()
+        story = []
+        append_story = story.append
+        # Sammenhengende normal-/blanklinjer slås sammen til én Paragraph
+        # med <br/>; reportlab parser og wrapper per flowable, så færre
+        # flowables gir merkbart raskere doc.build på lange notater.
+        # Normal-stilen har null spaceBefore/After, så layouten er lik.
+        pending_normal = []
+
+        def flush_normal():
+            if pending_normal:
+                append_story(Paragraph("<br/>".join(pending_normal), normal))
+                pending_normal.clear()
+
+        for block_type, value in blocks:
+            if block_type == "paragraphs":
+                for paragraph_info in value:
                     kind = paragraph_info["kind"]
                     runs = paragraph_info["runs"]
                     if kind == "blank":
-                        story.append(Paragraph("&nbsp;", normal))
+                        pending_normal.append("&nbsp;")
                         continue
 
                     paragraph_chunks = []
                     for run_text, is_bold, is_superscript in runs:
-                        escaped_text = escape(run_text)
-                        chunk = escaped_text
+                        chunk = escape(run_text)
                         if is_superscript:
                             chunk = f"<super>{chunk}</super>"
                         if is_bold:
@@ -3764,12 +4869,14 @@ class NoteOverlayApp:
 
                     paragraph_markup = "".join(paragraph_chunks) or "&nbsp;"
                     if kind == "heading":
+                        flush_normal()
                         level = min(3, int(paragraph_info["level"]))
-                        story.append(Paragraph(paragraph_markup, heading_styles[level]))
+                        append_story(Paragraph(paragraph_markup, heading_styles[level]))
                     elif kind == "bullet":
+                        flush_normal()
                         level = max(0, min(5, int(paragraph_info["level"])))
                         marker = paragraph_info.get("marker") or "\u2022"
-                        story.append(
+                        append_story(
                             Paragraph(
                                 paragraph_markup,
                                 bullet_styles[level],
@@ -3777,21 +4884,36 @@ class NoteOverlayApp:
                             )
                         )
                     else:
-                        story.append(Paragraph(paragraph_markup, normal))
-                story.append(Spacer(1, 8))
+                        pending_normal.append(paragraph_markup)
+                flush_normal()
+                append_story(Spacer(1, 8))
             else:
                 try:
-                    with Image.open(value) as img:
-                        width, height = img.size
+                    width, height = self._attachment_pixel_size(value)
+                    if width <= 0 or height <= 0:
+                        raise ValueError(f"ukjent bildestørrelse: {value}")
+                    image_source = value
                     max_width = 520
                     if width > max_width:
                         scale = max_width / width
-                        width = width * scale
-                        height = height * scale
-                    story.append(RLImage(value, width=width, height=height))
-                    story.append(Spacer(1, 10))
+                        width = int(width * scale)
+                        height = int(height * scale)
+                        # Nedskaler store skjermklipp i PIL før ReportLab
+                        # får dem; ReportLabs egen resampling under
+                        # doc.build er vesentlig tregere.
+                        resampling = getattr(Image, "Resampling", Image)
+                        with Image.open(value) as img:
+                            scaled = img.convert("RGB").resize(
+                                (width, height), resampling.BILINEAR
+                            )
+                        buffer = io.BytesIO()
+                        scaled.save(buffer, format="PNG", optimize=False)
+                        buffer.seek(0)
+                        image_source = buffer
+                    append_story(RLImage(image_source, width=width, height=height))
+                    append_story(Spacer(1, 10))
                 except Exception:
-                    story.append(
+                    append_story(
                         Paragraph(
                             escape(f"[Kunne ikke legge til bilde: {Path(value).name}]"),
                             normal,
@@ -3799,8 +4921,6 @@ class NoteOverlayApp:
                     )
 
         doc.build(story)
-        self._set_status(f"Eksporterte PDF: {target}")
-        messagebox.showinfo("Eksport fullført", f"Lagret PDF-fil:\n{target}")
 
     def on_close(self):
         if self._fade_after_id is not None:
@@ -3816,6 +4936,7 @@ class NoteOverlayApp:
             self._settings_window.destroy()
             self._settings_window = None
         self._save_session(silent=True, force_backup=True)
+        self._save_spell_verdict_cache()
         self.hotkey.stop()
         self.root.destroy()
 